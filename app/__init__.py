@@ -1,46 +1,128 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+import importlib
 import os
 from dotenv import load_dotenv
 from urllib.parse import quote
+from app.pool import engine_options
+from app.routing import RoutingSession, REPLICA_BIND
 
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY') or 'dev_key_very_secret'
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
 
-# Database configuration
-# MYSQL_HOST = os.getenv('MYSQL_HOST') or 'localhost'
-# MYSQL_PORT = os.getenv('MYSQL_PORT') or 3306
-# MYSQL_USER = os.getenv('MYSQL_USER') or 'root'
-# MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD') or 'root'
-# MYSQL_DB = os.getenv('MYSQL_DB') or 'car_repair_db'
+# name -> (module, blueprint attribute, url prefix); modules are only imported when enabled
+BLUEPRINTS = {
+    'main': ('app.index', 'main_bp', None),
+    'admin': ('app.admin', 'admin_bp', '/admin'),
+    'reception': ('app.reception', 'reception_bp', '/reception'),
+    'technician': ('app.technician', 'technician_bp', '/technician'),
+    'cashier': ('app.cashier', 'cashier_bp', '/cashier'),
+}
 
-# app.config["SQLALCHEMY_DATABASE_URI"] = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4" % quote('admin@123')
-app.config["SQLALCHEMY_DATABASE_URI"] = "mysql+pymysql://root:%s@localhost/car_repair_db?charset=utf8mb4" % quote('admin@123')
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = True
-app.config["PAGE_SIZE"] = 10
+BLUEPRINT_PROFILES = {
+    'all': tuple(BLUEPRINTS),
+    'reporting': ('main', 'admin'),
+    'front_desk': ('main', 'reception', 'technician', 'cashier'),
+}
 
-db = SQLAlchemy(app=app)
-login_manager = LoginManager(app=app)
-login_manager.login_view = 'main.login'
 
-from app import models
+def default_config():
+    # Database configuration
+    MYSQL_HOST = os.getenv('MYSQL_HOST') or 'localhost'
+    MYSQL_PORT = os.getenv('MYSQL_PORT') or 3306
+    MYSQL_USER = os.getenv('MYSQL_USER') or 'root'
+    MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD') or 'admin@123'
+    MYSQL_DB = os.getenv('MYSQL_DB') or 'car_repair_db'
+
+    return {
+        'SECRET_KEY': os.getenv('SECRET_KEY') or 'dev_key_very_secret',
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL') or f"mysql+pymysql://{MYSQL_USER}:{quote(MYSQL_PASSWORD)}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4",
+        'SQLALCHEMY_TRACK_MODIFICATIONS': True,
+        # Optional read replica for reporting queries
+        'REPLICA_DATABASE_URL': os.getenv('REPLICA_DATABASE_URL'),
+        'REPLICA_STICKY_SECONDS': 5,
+        'REPLICA_RETRY_SECONDS': 30,
+        'BLUEPRINTS': os.getenv('APP_BLUEPRINTS') or 'all',
+        'PAGE_SIZE': 10,
+        'SETTINGS_CACHE_TTL': 30,
+        'USER_CACHE_TTL': 300,
+        'USER_CACHE_SIZE': 256,
+        'INVOICE_CACHE_SIZE': 256,
+        'SIDEBAR_CACHE_TTL': 10,
+        'SIDEBAR_CACHE_SIZE': 256,
+    }
+
+
+def resolve_blueprints(names):
+    """Expand a profile name or a comma separated list ('main,admin') into blueprint names."""
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+
+    resolved = []
+    for name in names:
+        for blueprint in BLUEPRINT_PROFILES.get(name, (name,)):
+            if blueprint not in BLUEPRINTS:
+                raise ValueError(f'Unknown blueprint or profile: {blueprint}')
+            if blueprint not in resolved:
+                resolved.append(blueprint)
+    if 'main' not in resolved:
+        # Login and logout live in main, every other module redirects there.
+        resolved.insert(0, 'main')
+    return resolved
+
+
+def register_blueprints(app, names):
+    for name in resolve_blueprints(names):
+        module_name, attribute, url_prefix = BLUEPRINTS[name]
+        blueprint = getattr(importlib.import_module(module_name), attribute)
+        app.register_blueprint(blueprint, url_prefix=url_prefix)
+
+
+def create_app(config=None):
+    """Build the application.
+
+    `config` is a dict or an object/import path accepted by `config.from_object`;
+    its BLUEPRINTS key selects which modules are loaded (see BLUEPRINT_PROFILES).
+    """
+    app = Flask(__name__)
+    app.config.update(default_config())
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(uri))
+    replica_url = app.config.get('REPLICA_DATABASE_URL')
+    if replica_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {
+            REPLICA_BIND: {'url': replica_url, **engine_options(replica_url)}
+        })
+
+    from app import models  # noqa: F401 - registers the tables on db.metadata
+    from app.perf import init_perf
+    from app.low_stock import init_low_stock
+    from app import live_queue  # noqa: F401 - registers the slip status hooks
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    init_perf(app)
+    init_low_stock(app)
+    register_blueprints(app, app.config['BLUEPRINTS'])
+
+    @app.context_processor
+    def inject_modules():
+        # Lets shared templates hide links to modules this process did not load.
+        return {'modules': app.blueprints}
+
+    return app
+
 
 @login_manager.user_loader
 def load_user(user_id):
-    from app.models import User
-    return User.query.get(int(user_id))
-
-from app.index import main_bp
-from app.admin import admin_bp
-from app.reception import reception_bp
-from app.technician import technician_bp
-from app.cashier import cashier_bp
-
-app.register_blueprint(main_bp)
-app.register_blueprint(admin_bp, url_prefix='/admin')
-app.register_blueprint(reception_bp, url_prefix='/reception')
-app.register_blueprint(technician_bp, url_prefix='/technician')
-app.register_blueprint(cashier_bp, url_prefix='/cashier')
+    from app.dao import user_dao
+    return user_dao.get_session_user(int(user_id))
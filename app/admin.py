@@ -1,16 +1,19 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app, jsonify, Response, stream_with_context
 from app.dao import settings_dao, component_dao, invoice_dao, reception_dao, repair_dao
 from app.models import ReceptionSlip, Car, RepairDetail, Component, RepairSlip
-from app import db
+from app import db, perf, pool, low_stock
 from app.dao.component_dao import ComponentDAO
-from app.dao.settings_dao import SettingsDAO
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from datetime import datetime, timedelta
 import calendar
+import io
 
 
 admin_bp = Blueprint('admin', __name__)
 
+# Longest usage window the low-stock report accepts (ten years)
+MAX_USAGE_WINDOW_DAYS = 3650
+
 
 def check_admin():
     return session.get('role') == 'admin'
@@ -40,6 +43,7 @@ def dashboard():
 
     daily_revenue = invoice_dao.get_revenue_by_month(filter_month, filter_year)
     total_revenue = sum(daily_revenue.values())
+    last_year_revenue = invoice_dao.get_total_revenue_by_month(filter_month, filter_year - 1)
 
     _, num_days = calendar.monthrange(filter_year, filter_month)
     for day in range(1, num_days + 1):
@@ -55,14 +59,7 @@ def dashboard():
         for d, v in sorted(daily_revenue.items())
     ]
 
-    vehicle_counts = db.session.query(
-        Car.vehicle_type,
-        func.count(ReceptionSlip.id).label('count')
-    ).join(ReceptionSlip, ReceptionSlip.car_id == Car.id) \
-        .filter(
-        extract('month', ReceptionSlip.reception_date) == filter_month,
-        extract('year', ReceptionSlip.reception_date) == filter_year
-    ).group_by(Car.vehicle_type).all()
+    vehicle_counts = reception_dao.count_by_vehicle_type(filter_month, filter_year)
 
     vehicle_stats = []
     total_vehicles = 0
@@ -75,17 +72,7 @@ def dashboard():
         })
         total_vehicles += count
 
-    from app.models import RepairSlip
-
-    category_counts = db.session.query(
-        RepairDetail.category,
-        func.count(RepairDetail.id).label('count')
-    ).join(RepairSlip, RepairDetail.repair_slip_id == RepairSlip.id) \
-        .join(ReceptionSlip, RepairSlip.reception_slip_id == ReceptionSlip.id) \
-        .filter(
-        extract('month', ReceptionSlip.reception_date) == filter_month,
-        extract('year', ReceptionSlip.reception_date) == filter_year
-    ).group_by(RepairDetail.category).all()
+    category_counts = repair_dao.count_by_category(filter_month, filter_year)
 
     category_stats = []
 
@@ -99,6 +86,7 @@ def dashboard():
     return render_template('admin/dashboard.html',
                            chart_data=chart_data,
                            total_revenue=total_revenue,
+                           last_year_revenue=last_year_revenue,
                            vehicle_stats=vehicle_stats,
                            category_stats=category_stats,
                            filter_day=filter_day,
@@ -189,29 +177,11 @@ def accessories():
     if not check_admin():
         return redirect(url_for('main.login'))
 
-    components = component_dao.get_all_active()
-
-    component_stats = []
-    for comp in components:
-        used_count = db.session.query(func.count(RepairDetail.id)) \
-            .filter(RepairDetail.component_id == comp.id) \
-            .scalar()
-
-        imported = comp.stock_quantity + used_count
-
-        component_stats.append({
-            'id': comp.id,
-            'code': f'P{str(comp.id).zfill(3)}',
-            'name': comp.name,
-            'imported': imported,
-            'used': used_count,
-            'inventory': comp.stock_quantity,
-            'price': comp.current_price
-        })
+    component_stats = component_dao.get_usage_stats()
 
-    most_used = sorted(component_stats, key=lambda x: x['used'], reverse=True)[:5]
+    most_used = component_dao.get_most_used(5)
 
-    most_imported = sorted(component_stats, key=lambda x: x['imported'], reverse=True)[:5]
+    most_imported = component_dao.get_most_imported(5)
 
     total_inventory = sum(c['inventory'] for c in component_stats)
 
@@ -233,12 +203,13 @@ def update_accessory_price(component_id):
     if not check_admin():
         return redirect(url_for('main.login'))
 
-    try:
-        new_price = float(request.form['price'])
-        component_dao.update_component(component_id, current_price=new_price)
-        flash('Price updated successfully!')
-    except ValueError:
+    result = component_dao.update_prices({component_id: request.form.get('price')}, session.get('user_id'))[0]
+    if result['status'] == 'invalid':
         flash('Invalid price format!')
+    elif result['status'] == 'not_found':
+        flash('Component not found!')
+    else:
+        flash('Price updated successfully!')
 
     return redirect(url_for('admin.accessories'))
 
@@ -248,18 +219,20 @@ def batch_update_prices():
     if not check_admin():
         return redirect(url_for('main.login'))
 
-    updated_count = 0
+    prices = {}
     for key, value in request.form.items():
         if key.startswith('price_'):
-            component_id = int(key.split('_')[1])
             try:
-                new_price = float(value)
-                if new_price > 0:
-                    component_dao.update_component(component_id, current_price=new_price)
-                    updated_count += 1
+                prices[int(key.split('_')[1])] = value
             except ValueError:
                 continue
 
+    results = component_dao.update_prices(prices, session.get('user_id'))
+    updated_count = sum(1 for r in results if r['status'] == 'updated')
+    failed = [str(r['id']) for r in results if r['status'] in ('invalid', 'not_found')]
+
+    if failed:
+        flash(f'Skipped invalid or missing components: {", ".join(failed)}')
     flash(f'{updated_count} prices updated successfully!')
     return redirect(url_for('admin.accessories'))
 
@@ -319,61 +292,25 @@ def low_stock_alert():
     if not check_admin():
         return redirect(url_for('main.login'))
 
-    all_components = Component.query.filter_by(is_deleted=False).all()
+    try:
+        window_days = int(request.args.get('window', 30))
+        if window_days < 1:
+            window_days = 30
+        window_days = min(window_days, MAX_USAGE_WINDOW_DAYS)
+    except (ValueError, OverflowError):
+        window_days = 30
 
     threshold = ComponentDAO.get_low_stock_threshold()
-    components = ComponentDAO.get_low_stock_components()
-
-    components_data = []
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-
-    for comp in components:
-
-        used = db.session.query(func.sum(RepairDetail.quantity)) \
-            .filter(RepairDetail.component_id == comp.id) \
-            .scalar() or 0
-
-        imported = comp.stock_quantity + used
-
-        recent_usage = db.session.query(func.sum(RepairDetail.quantity)) \
-            .join(RepairSlip, RepairDetail.repair_slip_id == RepairSlip.id) \
-            .filter(
-                RepairDetail.component_id == comp.id,
-                RepairSlip.start_date >= thirty_days_ago
-            ).scalar() or 0
-
-        if comp.stock_quantity == 0:
-            status = 'out'
-            status_text = 'Out of Stock'
-            status_color = '#DC3545'
-        else:
-            status = 'low'
-            status_text = 'Low Stock'
-            status_color = '#FFA500'
-
-        components_data.append({
-            'id': comp.id,
-            'name': comp.name,
-
-            'stock_quantity': comp.stock_quantity,
-            'current_price': comp.current_price,
-            'price': comp.current_price,
-
-            'imported': imported,
-            'used': used,
-            'recent_usage': recent_usage,
-
-            'status': status,
-            'status_text': status_text,
-            'status_color': status_color
-        })
+    components_data = ComponentDAO.get_low_stock_report(window_days, threshold)
+    all_components = component_dao.get_component_options()
 
     return render_template(
         'admin/low_stock_alert.html',
         components=components_data,
         threshold=threshold,
         total_alerts=len(components_data),
-        all_components=all_components
+        all_components=all_components,
+        window_days=window_days
     )
 
 
@@ -383,9 +320,25 @@ def low_stock_count():
     if not check_admin():
         return {'count': 0}
 
-    return {
-        'count': ComponentDAO.count_low_stock_components()
-    }
+    count = low_stock.get_low_stock_count()
+    response = jsonify(count=count)
+    # Let browsers revalidate with If-None-Match and get an empty 304 while the count is unchanged.
+    response.set_etag(f'low-stock-{count}')
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
+
+@admin_bp.route('/low-stock-stream')
+def low_stock_stream():
+    if not check_admin():
+        # 204 tells EventSource to stop reconnecting.
+        return '', 204
+
+    stream = low_stock.event_stream(current_app.config['LOW_STOCK_STREAM_TIMEOUT'],
+                                    current_app.config['LOW_STOCK_STREAM_POLL'])
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @admin_bp.route('/update-stock-threshold', methods=['POST'])
@@ -396,7 +349,7 @@ def update_stock_threshold():
     try:
         threshold = int(request.form['threshold'])
         if 0 <= threshold <= 100:
-            SettingsDAO.set_setting('low_stock_threshold', threshold)
+            settings_dao.set_setting('low_stock_threshold', threshold)
             flash('Warning threshold updated successfully.')
         else:
             flash('The value must be between 0 and 100.')
@@ -415,17 +368,54 @@ def import_components():
     component_ids = request.form.getlist('component_id[]')
     quantities = request.form.getlist('quantity[]')
 
-    for comp_id, qty in zip(component_ids, quantities):
-        component = Component.query.filter_by(
-            id=int(comp_id),
-            is_deleted=False
-        ).first()
-
-        if not component:
+    increments = {}
+    invalid_rows = []
+    for row_no, (comp_id, qty) in enumerate(zip(component_ids, quantities), start=1):
+        parsed = component_dao.parse_stock_row(comp_id, qty)
+        if not parsed:
+            invalid_rows.append(row_no)
             continue
+        component_id, quantity = parsed
+        increments[component_id] = increments.get(component_id, 0) + quantity
+
+    result = component_dao.import_stock(increments)
+    return {'success': True, 'invalid_rows': invalid_rows, **result}
+
+
+@admin_bp.route('/import-components/csv', methods=['POST'])
+def import_components_csv():
+    if not check_admin():
+        return {'success': False, 'message': 'Unauthorized'}
+
+    upload = request.files.get('file')
+    if upload:
+        stream = upload.stream
+    elif request.mimetype == 'text/csv':
+        stream = request.stream
+    else:
+        return {'success': False, 'message': 'No CSV file uploaded'}
+
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    result = component_dao.import_stock_csv(lines)
+    return {'success': True, **result}
+
+
+@admin_bp.route('/perf')
+def perf_report():
+    if not check_admin():
+        return redirect(url_for('main.login'))
+
+    recent = list(reversed(perf.get_history()))[:50]
 
-        component.stock_quantity += int(qty)
+    return render_template('admin/perf.html',
+                           endpoints=perf.summarize_history(),
+                           recent=recent,
+                           pool_stats=pool.get_pool_stats())
 
-    db.session.commit()
-    return {'success': True}
 
+@admin_bp.route('/pool-stats')
+def pool_stats():
+    if not check_admin():
+        return {'success': False, 'message': 'Unauthorized'}
+
+    return pool.get_pool_stats()
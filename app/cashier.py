@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from app.dao import repair_dao, reception_dao, settings_dao, invoice_dao, component_dao
-from app.models import ReceptionSlip, Car, RepairSlip, RepairDetail
-from app import db
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app, Response, stream_with_context
+from app.dao import repair_dao, reception_dao, settings_dao, invoice_dao, component_dao, view_dao
+from app.dao.transaction import unit_of_work
+from app.models import ReceptionSlip, Car, RepairSlip, RepairDetail, Invoice
+from app import db, live_queue
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
 cashier_bp = Blueprint('cashier', __name__)
@@ -12,6 +14,14 @@ def check_cashier():
     return role in ['cashier', 'admin']
 
 
+def _filter_statuses(filter_status):
+    if filter_status == 'completed':
+        return ['completed']
+    elif filter_status == 'paid':
+        return ['paid']
+    return ['completed', 'paid']
+
+
 @cashier_bp.route('/')
 def home():
     if not check_cashier():
@@ -20,25 +30,16 @@ def home():
     vat_rate = settings_dao.get_setting_float('vat_rate', 10.0)
 
     filter_status = request.args.get('filter')
+    live_seq = live_queue.current_seq()
+
+    page = repair_dao.get_completed_repairs(
+        _filter_statuses(filter_status),
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
 
-    query = db.session.query(ReceptionSlip, Car, RepairSlip)\
-        .join(Car, ReceptionSlip.car_id == Car.id)\
-        .join(RepairSlip, ReceptionSlip.id == RepairSlip.reception_slip_id)
-    
-    if filter_status == 'completed':
-        query = query.filter(ReceptionSlip.status == 'completed')
-    elif filter_status == 'paid':
-        query = query.filter(ReceptionSlip.status == 'paid')
-    else:
-        query = query.filter(ReceptionSlip.status.in_(['completed', 'paid']))
-        
-    results = query.order_by(RepairSlip.end_date.desc()).all()
-    
     completed_slips = []
-    for slip, car, repair in results:
-        details = RepairDetail.query.filter_by(repair_slip_id=repair.id).all()
-        subtotal = sum(d.price_at_time * d.quantity + d.labor_fee for d in details)
-        
+    for slip, car, repair, subtotal in page:
         completed_slips.append({
             'id': slip.id,
             'car_id': slip.car_id,
@@ -64,57 +65,101 @@ def home():
             'license_plate': car.license_plate
         })
     
-    return render_template('cashier/home.html', completed_slips=completed_slips, recent_invoices=recent_invoices, vat_rate=vat_rate, current_filter=filter_status)
+    return render_template('cashier/home.html', completed_slips=completed_slips, page=page, recent_invoices=recent_invoices, vat_rate=vat_rate, current_filter=filter_status, live_seq=live_seq)
+
+
+@cashier_bp.route('/stream')
+def queue_stream():
+    if not check_cashier():
+        # 204 tells EventSource to stop reconnecting.
+        return '', 204
+
+    statuses = _filter_statuses(request.args.get('filter'))
+    vat_rate = settings_dao.get_setting_float('vat_rate', 10.0)
+
+    def in_view(status, row):
+        return status in statuses and row['repair_id'] is not None
+
+    def render(change):
+        action = live_queue.queue_delta(change, in_view)
+        if action is None:
+            return None
+
+        html = None
+        if action != 'removed':
+            row = dict(change['row'], total_amount=float(change['row']['total_amount'] or 0))
+            html = render_template('cashier/queue_row.html', slip=row, index='', vat_rate=vat_rate)
+        return {'action': action, 'slip_id': change['slip_id'], 'position': 'top', 'html': html}
+
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    since = int(since) if since and since.isdigit() else live_queue.current_seq()
+    stream = live_queue.event_stream(since, render, current_app.config.get('LIVE_QUEUE_STREAM_TIMEOUT', 300))
+    # The stream never touches the database: don't pin a pooled connection while it is open.
+    db.session.remove()
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def _render_invoice_paper(repair, items, vat_rate, issued_at):
+    subtotal, vat_amount, total_amount = invoice_dao.invoice_totals(items, vat_rate)
+    return render_template('cashier/invoice_paper.html', repair=repair, items=items,
+                           subtotal=subtotal, vat_rate=vat_rate, vat_amount=vat_amount,
+                           total_amount=total_amount, issued_at=issued_at)
+
+
+def _render_paid_invoice(invoice_id):
+    snapshot = invoice_dao.get_invoice_snapshot(invoice_id)
+    if snapshot:
+        return render_template('cashier/invoice_paper.html', repair=snapshot['repair'], items=snapshot['items'],
+                               subtotal=snapshot['subtotal'], vat_rate=snapshot['vat_rate'],
+                               vat_amount=snapshot['vat_amount'], total_amount=snapshot['total_amount'],
+                               issued_at=snapshot['issued_at'])
+
+    # Invoices paid before snapshots were stored are rebuilt from the repair as it is now
+    invoice = db.session.get(Invoice, invoice_id)
+    if not invoice:
+        return None
+    repair = view_dao.get_repair_view(invoice.repair_slip_id)
+    items = view_dao.get_item_views(invoice.repair_slip_id)
+    return _render_invoice_paper(repair, items, invoice.vat_rate, invoice.created_at)
+
+
+@cashier_bp.route('/invoices/<int:invoice_id>')
+def paid_invoice(invoice_id):
+    if not check_cashier():
+        return redirect(url_for('main.login'))
+
+    invoice_paper = invoice_dao.get_invoice_html(invoice_id, _render_paid_invoice)
+    if invoice_paper is None:
+        flash('Invoice not found.')
+        return redirect(url_for('cashier.home'))
+
+    return render_template('cashier/invoice.html', invoice_paper=invoice_paper, payable=False)
 
 
 @cashier_bp.route('/invoice/<int:repair_id>')
 def invoice(repair_id):
     if not check_cashier():
         return redirect(url_for('main.login'))
+
+    # Paid repairs reprint exactly what was charged
+    invoice_id = invoice_dao.get_invoice_id_by_repair_id(repair_id)
+    if invoice_id:
+        return paid_invoice(invoice_id)
     
-    result = repair_dao.get_repair_by_id(repair_id)
-    if not result:
+    repair = view_dao.get_repair_view(repair_id)
+    if not repair:
         flash('Repair not found.')
         return redirect(url_for('cashier.home'))
-    
-    repair_slip, slip, car = result
-    
-    repair = {
-        'repair_id': repair_slip.id,
-        'license_plate': car.license_plate,
-        'owner_name': car.owner_name,
-        'phone_number': car.phone_number,
-        'address': car.address,
-        'vehicle_type': car.vehicle_type,
-        'color': car.color,
-        'reception_date': slip.reception_date,
-        'status': slip.status
-    }
-
-    details = repair_dao.get_repair_details(repair_id)
-    items = []
-    for detail, component in details:
-        items.append({
-            'id': detail.id,
-            'component_id': detail.component_id,
-            'quantity': detail.quantity,
-            'price_at_time': detail.price_at_time,
-            'category': detail.category,
-            'labor_fee': detail.labor_fee,
-            'name': component.name if component else None
-        })
+
+    items = view_dao.get_item_views(repair_id)
 
     vat_rate = settings_dao.get_setting_float('vat_rate', 10.0)
 
-    subtotal = sum(item['price_at_time'] * item['quantity'] + item['labor_fee'] for item in items)
-    vat_amount = float(subtotal) * (vat_rate / 100)
-    total_amount = float(subtotal) + vat_amount
+    invoice_paper = _render_invoice_paper(repair, items, vat_rate, datetime.now())
     
-    today = datetime.now().strftime('%d/%m/%Y')
-    
-    return render_template('cashier/invoice.html', repair=repair, items=items, 
-                           subtotal=subtotal, vat_rate=vat_rate, vat_amount=vat_amount, 
-                           total_amount=total_amount, today=today)
+    return render_template('cashier/invoice.html', invoice_paper=invoice_paper,
+                           repair_id=repair.repair_id, payable=repair.status == 'completed')
 
 
 @cashier_bp.route('/pay/<int:repair_id>', methods=['POST'])
@@ -122,16 +167,34 @@ def process_payment(repair_id):
     """Process payment and create invoice"""
     if not check_cashier():
         return redirect(url_for('main.login'))
-    
-    total_amount = float(request.form['total_amount'])
 
     vat_rate = settings_dao.get_setting_float('vat_rate', 10.0)
 
-    invoice_dao.create_invoice(repair_id, session['user_id'], total_amount, vat_rate)
+    if invoice_dao.get_invoice_id_by_repair_id(repair_id):
+        flash('This repair has already been paid.')
+        return redirect(url_for('cashier.home'))
+
+    repair = view_dao.get_repair_view(repair_id)
+    if not repair:
+        flash('Repair not found.')
+        return redirect(url_for('cashier.home'))
+    if repair.status != 'completed':
+        flash('Only completed repairs can be paid.')
+        return redirect(url_for('cashier.home'))
 
-    repair = repair_dao.get_repair_only_by_id(repair_id)
-    if repair:
-        reception_dao.update_slip_status(repair.reception_slip_id, 'paid')
+    try:
+        with unit_of_work():
+            # The amount charged and the printed invoice both come from this snapshot
+            items = view_dao.get_item_views(repair_id)
+            snapshot = invoice_dao.build_snapshot(repair, items, vat_rate, datetime.now())
+            invoice_dao.create_invoice(repair_id, session['user_id'], snapshot['total_amount'], vat_rate,
+                                       snapshot=snapshot, commit=False)
+
+            reception_dao.update_slip_status(repair.reception_id, 'paid', commit=False)
+    except IntegrityError:
+        # Another request invoiced this repair first; its transaction stands, ours was rolled back.
+        flash('This repair has already been paid.')
+        return redirect(url_for('cashier.home'))
     
     flash('Payment processed successfully!')
     return redirect(url_for('cashier.home'))
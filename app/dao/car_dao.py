@@ -1,16 +1,26 @@
-from app.models import Car
+from app.models import Car, CarNameToken
+from app.dao.transaction import save
+from app.normalize import normalize_plate, normalize_phone, normalize_name, name_tokens, car_search_keys
 from app import db
+from sqlalchemy import or_, and_, update, delete, insert
+
+SEARCH_LIMIT = 10
+
+# Columns returned by search_cars, enough to render a typeahead entry and prefill the reception form
+_SEARCH_COLUMNS = (Car.id, Car.license_plate, Car.owner_name, Car.phone_number, Car.vehicle_type)
 
 
 def get_car_by_plate(license_plate):
-    return Car.query.filter(Car.license_plate == license_plate).first()
+    # '51A-123.45' and '51a12345' are the same car; the raw match covers rows not yet backfilled.
+    return Car.query.filter(or_(Car.plate_key == normalize_plate(license_plate),
+                                Car.license_plate == license_plate)).first()
 
 
 def get_car_by_id(car_id):
     return Car.query.get(car_id)
 
 
-def create_car(license_plate, owner_name, phone_number=None, address=None, email=None, vehicle_type=None, color=None):
+def create_car(license_plate, owner_name, phone_number=None, address=None, email=None, vehicle_type=None, color=None, commit=True):
     car = Car(
         license_plate=license_plate,
         owner_name=owner_name,
@@ -21,11 +31,11 @@ def create_car(license_plate, owner_name, phone_number=None, address=None, email
         color=color
     )
     db.session.add(car)
-    db.session.commit()
+    save(commit)
     return car
 
 
-def update_car(car_id, owner_name=None, phone_number=None, address=None, email=None, vehicle_type=None, color=None):
+def update_car(car_id, owner_name=None, phone_number=None, address=None, email=None, vehicle_type=None, color=None, commit=True):
     car = Car.query.get(car_id)
     if car:
         if owner_name is not None:
@@ -40,13 +50,86 @@ def update_car(car_id, owner_name=None, phone_number=None, address=None, email=N
             car.vehicle_type = vehicle_type
         if color is not None:
             car.color = color
-        db.session.commit()
+        save(commit)
     return car
 
 
-def create_or_update_car(license_plate, owner_name, phone_number=None, address=None, email=None, vehicle_type=None, color=None):
+def create_or_update_car(license_plate, owner_name, phone_number=None, address=None, email=None, vehicle_type=None, color=None, commit=True):
     car = get_car_by_plate(license_plate)
     if car:
-        return update_car(car.id, owner_name, phone_number, address, email, vehicle_type, color)
+        return update_car(car.id, owner_name, phone_number, address, email, vehicle_type, color, commit=commit)
     else:
-        return create_car(license_plate, owner_name, phone_number, address, email, vehicle_type, color)
+        return create_car(license_plate, owner_name, phone_number, address, email, vehicle_type, color, commit=commit)
+
+
+def _search_tiers(q):
+    """(rank, matched field, condition, order) lookups for a query, best match first.
+
+    Every condition is an equality or a 'prefix%' LIKE on an indexed key. A word inside
+    the owner name ('duc' in 'tran duc anh') is looked up in car_name_tokens rather than
+    with a '% word%' LIKE, which would scan the whole table.
+    """
+    plate = normalize_plate(q)
+    digits = normalize_phone(q)
+    name = normalize_name(q)
+    tiers = []
+
+    if plate:
+        tiers.append((0, 'plate', Car.plate_key == plate, Car.plate_key))
+        tiers.append((1, 'plate', Car.plate_key.like(plate + '%'), Car.plate_key))
+    if digits and digits == plate:
+        tiers.append((2, 'plate', Car.plate_number.like(digits + '%'), Car.plate_number))
+    if len(digits) >= 3:
+        tiers.append((3, 'phone', Car.phone_key.like(digits + '%'), Car.phone_key))
+    if name.replace(' ', '').isalpha():
+        tiers.append((4, 'owner', Car.owner_key.like(name + '%'), Car.owner_key))
+        word = name.split()[0]
+        condition = and_(CarNameToken.car_id == Car.id, CarNameToken.token.like(word + '%'))
+        if word != name:
+            condition = and_(condition, Car.owner_key.like('% ' + name + '%'))
+        tiers.append((5, 'owner', condition, CarNameToken.token))
+    return tiers
+
+
+def search_cars(q, limit=SEARCH_LIMIT):
+    """Typeahead search by plate, phone or owner name.
+
+    Input is normalized the same way as the stored keys, so '51a 123', '0903 12'
+    and 'tran duc' match '51A-123.45', '0903.123.456' and 'Trần Đức'.
+    """
+    results = []
+    seen = set()
+    for rank, matched, condition, order in _search_tiers(q or ''):
+        if len(results) >= limit:
+            break
+        rows = db.session.query(*_SEARCH_COLUMNS).filter(condition) \
+            .order_by(order).limit(limit + len(seen)).all()
+        for row in rows:
+            if row.id in seen:
+                continue
+            seen.add(row.id)
+            results.append({**row._asdict(), 'matched': matched, 'rank': rank})
+            if len(results) >= limit:
+                break
+    return results
+
+
+def rebuild_search_keys(chunk_size=5000):
+    """Recompute the normalized search keys and name tokens of every car, in id order, one chunk per commit."""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Car.id, Car.license_plate, Car.owner_name, Car.phone_number) \
+            .filter(Car.id > last_id).order_by(Car.id).limit(chunk_size).all()
+        if not rows:
+            return updated
+        keys = {row.id: car_search_keys(row.license_plate, row.owner_name, row.phone_number) for row in rows}
+        db.session.execute(update(Car), [{'id': car_id, **values} for car_id, values in keys.items()])
+        db.session.execute(delete(CarNameToken).where(CarNameToken.car_id.in_(keys)))
+        tokens = [{'car_id': car_id, 'token': token}
+                  for car_id, values in keys.items() for token in name_tokens(values['owner_key'])]
+        if tokens:
+            db.session.execute(insert(CarNameToken), tokens)
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
@@ -1,6 +1,13 @@
-from app.models import Component
-from app.dao.settings_dao import SettingsDAO
+from app.models import Component, ComponentPriceHistory, RepairDetail, RepairSlip
+from app.dao import settings_dao
+from app.dao.transaction import save
 from app import db
+from app.routing import read_replica
+from sqlalchemy import func, desc, case, insert
+from datetime import datetime, timedelta
+import csv
+
+IMPORT_CHUNK_SIZE = 500
 
 
 def get_all_active():
@@ -11,11 +18,18 @@ def get_all_components():
     return Component.query.filter_by(is_deleted=False).all()
 
 
+def get_component_options():
+    return db.session.query(Component.id, Component.name, Component.current_price, Component.stock_quantity)\
+        .filter(Component.is_deleted == False)\
+        .order_by(Component.id.asc())\
+        .all()
+
+
 def get_component_by_id(component_id):
     return Component.query.get(component_id)
 
 
-def add_component(name, current_price, stock_quantity=0):
+def add_component(name, current_price, stock_quantity=0, commit=True):
     component = Component(
         name=name,
         current_price=current_price,
@@ -23,11 +37,11 @@ def add_component(name, current_price, stock_quantity=0):
         is_deleted=False
     )
     db.session.add(component)
-    db.session.commit()
+    save(commit)
     return component
 
 
-def update_component(component_id, name=None, current_price=None, stock_quantity=None):
+def update_component(component_id, name=None, current_price=None, stock_quantity=None, commit=True):
     component = Component.query.get(component_id)
     if component:
         if name is not None:
@@ -36,25 +50,233 @@ def update_component(component_id, name=None, current_price=None, stock_quantity
             component.current_price = current_price
         if stock_quantity is not None:
             component.stock_quantity = stock_quantity
-        db.session.commit()
+        save(commit)
     return component
 
 
-def soft_delete_component(component_id):
+def soft_delete_component(component_id, commit=True):
     component = Component.query.get(component_id)
     if component:
         component.is_deleted = True
-        db.session.commit()
+        save(commit)
         return True
     return False
 
 
+def _apply_stock_increments(increments):
+    ids = list(increments)
+    valid_ids = {
+        row.id for row in db.session.query(Component.id).filter(
+            Component.id.in_(ids),
+            Component.is_deleted == False
+        )
+    }
+
+    if valid_ids:
+        added = case(
+            {component_id: increments[component_id] for component_id in valid_ids},
+            value=Component.id,
+            else_=0
+        )
+        Component.query.filter(
+            Component.id.in_(valid_ids),
+            Component.is_deleted == False
+        ).update({
+            Component.stock_quantity: func.coalesce(Component.stock_quantity, 0) + added
+        }, synchronize_session=False)
+
+    return valid_ids, [component_id for component_id in ids if component_id not in valid_ids]
+
+
+def import_stock(increments, chunk_size=IMPORT_CHUNK_SIZE, commit=True):
+    """Add stock for many components at once; `increments` maps component id -> quantity."""
+    result = {'updated': 0, 'unknown': []}
+    ids = list(increments)
+
+    for start in range(0, len(ids), chunk_size):
+        chunk = {component_id: increments[component_id] for component_id in ids[start:start + chunk_size]}
+        updated, unknown = _apply_stock_increments(chunk)
+        result['updated'] += len(updated)
+        result['unknown'].extend(unknown)
+
+    save(commit)
+    return result
+
+
+def parse_stock_row(component_id, quantity):
+    try:
+        component_id = int(component_id)
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        return None
+    if quantity <= 0:
+        return None
+    return component_id, quantity
+
+
+def import_stock_csv(lines, chunk_size=IMPORT_CHUNK_SIZE):
+    """Stream `component_id,quantity` rows from `lines`, committing every `chunk_size` distinct components."""
+    result = {'updated': 0, 'unknown': [], 'invalid_rows': []}
+    pending = {}
+
+    def flush():
+        updated, unknown = _apply_stock_increments(pending)
+        db.session.commit()
+        result['updated'] += len(updated)
+        result['unknown'].extend(unknown)
+        pending.clear()
+
+    for line_no, row in enumerate(csv.reader(lines), start=1):
+        if not row or not ''.join(row).strip():
+            continue
+
+        parsed = parse_stock_row(*row[:2]) if len(row) >= 2 else None
+        if not parsed:
+            # A non-numeric first line is treated as the header.
+            if line_no > 1 or row[0].strip().isdigit():
+                result['invalid_rows'].append(line_no)
+            continue
+
+        component_id, quantity = parsed
+        pending[component_id] = pending.get(component_id, 0) + quantity
+        if len(pending) >= chunk_size:
+            flush()
+
+    if pending:
+        flush()
+    return result
+
+
+def _parse_price(value):
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price > 0 else None
+
+
+def update_prices(prices, changed_by=None, chunk_size=IMPORT_CHUNK_SIZE, commit=True):
+    """Validate and apply `prices` (component id -> new price) in one transaction, logging each change."""
+    results = {}
+    new_prices = {}
+    for component_id, value in prices.items():
+        price = _parse_price(value)
+        if price is None:
+            results[component_id] = {'id': component_id, 'status': 'invalid', 'old_price': None, 'new_price': None}
+        else:
+            new_prices[component_id] = price
+
+    ids = list(new_prices)
+    current_prices = {}
+    for start in range(0, len(ids), chunk_size):
+        rows = db.session.query(Component.id, Component.current_price).filter(
+            Component.id.in_(ids[start:start + chunk_size]),
+            Component.is_deleted == False
+        ).all()
+        current_prices.update({row.id: row.current_price for row in rows})
+
+    updated = {}
+    history = []
+    now = datetime.now()
+    for component_id in ids:
+        price = new_prices[component_id]
+        old_price = current_prices.get(component_id)
+
+        if component_id not in current_prices:
+            status = 'not_found'
+        elif old_price == price:
+            status = 'unchanged'
+        else:
+            status = 'updated'
+            updated[component_id] = price
+            history.append({
+                'component_id': component_id,
+                'old_price': old_price,
+                'new_price': price,
+                'changed_at': now,
+                'changed_by': changed_by
+            })
+
+        results[component_id] = {'id': component_id, 'status': status, 'old_price': old_price, 'new_price': price}
+
+    updated_ids = list(updated)
+    for start in range(0, len(updated_ids), chunk_size):
+        chunk = updated_ids[start:start + chunk_size]
+        Component.query.filter(Component.id.in_(chunk)).update({
+            Component.current_price: case(
+                {component_id: updated[component_id] for component_id in chunk},
+                value=Component.id
+            )
+        }, synchronize_session=False)
+
+    if history:
+        db.session.execute(insert(ComponentPriceHistory), history)
+    save(commit)
+
+    return [results[component_id] for component_id in prices]
+
+
+def _usage_stats_query():
+    usage = db.session.query(
+        RepairDetail.component_id.label('component_id'),
+        func.count(RepairDetail.id).label('used')
+    ).group_by(RepairDetail.component_id).subquery()
+
+    used = func.coalesce(usage.c.used, 0)
+    inventory = func.coalesce(Component.stock_quantity, 0)
+
+    return db.session.query(
+        Component.id,
+        Component.name,
+        Component.current_price,
+        inventory.label('inventory'),
+        used.label('used'),
+        (inventory + used).label('imported')
+    ).outerjoin(usage, usage.c.component_id == Component.id)\
+        .filter(Component.is_deleted == False)
+
+
+def _usage_stats_to_dict(row):
+    return {
+        'id': row.id,
+        'code': f'P{str(row.id).zfill(3)}',
+        'name': row.name,
+        'imported': int(row.imported),
+        'used': int(row.used),
+        'inventory': int(row.inventory),
+        'price': row.current_price
+    }
+
+
+@read_replica
+def get_usage_stats():
+    results = _usage_stats_query().order_by(Component.id.asc()).all()
+    return [_usage_stats_to_dict(r) for r in results]
+
+
+@read_replica
+def get_most_used(limit=5):
+    results = _usage_stats_query()\
+        .order_by(desc('used'), Component.id.asc())\
+        .limit(limit)\
+        .all()
+    return [_usage_stats_to_dict(r) for r in results]
+
+
+@read_replica
+def get_most_imported(limit=5):
+    results = _usage_stats_query()\
+        .order_by(desc('imported'), Component.id.asc())\
+        .limit(limit)\
+        .all()
+    return [_usage_stats_to_dict(r) for r in results]
+
 
 class ComponentDAO:
 
     @staticmethod
     def get_low_stock_threshold(default=10):
-        value = SettingsDAO.get_setting('low_stock_threshold', default)
+        value = settings_dao.get_setting('low_stock_threshold', default)
         try:
             return int(value)
         except:
@@ -75,3 +297,76 @@ class ComponentDAO:
             Component.is_deleted == False,
             Component.stock_quantity <= threshold
         ).count()
+
+    @staticmethod
+    @read_replica
+    def get_low_stock_report(window_days=30, threshold=None):
+        if threshold is None:
+            threshold = ComponentDAO.get_low_stock_threshold()
+        since = datetime.now() - timedelta(days=window_days)
+
+        used = func.coalesce(func.sum(RepairDetail.quantity), 0)
+        recent_usage = func.coalesce(func.sum(case(
+            (RepairSlip.start_date >= since, RepairDetail.quantity),
+            else_=0
+        )), 0)
+
+        results = db.session.query(
+            Component.id,
+            Component.name,
+            Component.stock_quantity,
+            Component.current_price,
+            used.label('used'),
+            recent_usage.label('recent_usage')
+        ).outerjoin(RepairDetail, RepairDetail.component_id == Component.id)\
+            .outerjoin(RepairSlip, RepairDetail.repair_slip_id == RepairSlip.id)\
+            .filter(
+                Component.is_deleted == False,
+                Component.stock_quantity <= threshold
+            ).group_by(
+                Component.id,
+                Component.name,
+                Component.stock_quantity,
+                Component.current_price
+            ).order_by(Component.stock_quantity.asc())\
+            .all()
+
+        report = []
+        for row in results:
+            stock = row.stock_quantity or 0
+            used = int(row.used)
+            recent_usage = int(row.recent_usage)
+
+            if recent_usage > 0:
+                days_remaining = int(stock * window_days / recent_usage)
+            else:
+                days_remaining = None
+
+            if stock == 0:
+                status = 'out'
+                status_text = 'Out of Stock'
+                status_color = '#DC3545'
+            else:
+                status = 'low'
+                status_text = 'Low Stock'
+                status_color = '#FFA500'
+
+            report.append({
+                'id': row.id,
+                'name': row.name,
+
+                'stock_quantity': stock,
+                'current_price': row.current_price,
+                'price': row.current_price,
+
+                'imported': stock + used,
+                'used': used,
+                'recent_usage': recent_usage,
+                'days_remaining': days_remaining,
+
+                'status': status,
+                'status_text': status_text,
+                'status_color': status_color
+            })
+
+        return report
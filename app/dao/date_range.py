@@ -0,0 +1,39 @@
+from sqlalchemy import Date, and_
+from datetime import datetime, date, timedelta
+
+
+def day_range(day):
+    start = datetime(day.year, day.month, day.day)
+    return start, start + timedelta(days=1)
+
+
+def month_range(month, year):
+    start = datetime(year, month, 1)
+    if month == 12:
+        end = datetime(year + 1, 1, 1)
+    else:
+        end = datetime(year, month + 1, 1)
+    return start, end
+
+
+def year_range(year):
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def between(column, start, end):
+    """Half-open [start, end) filter that leaves the column bare so an index on it can be used."""
+    if isinstance(column.type, Date):
+        start, end = start.date(), end.date()
+    return and_(column >= start, column < end)
+
+
+def on_day(column, day=None):
+    return between(column, *day_range(day or date.today()))
+
+
+def in_month(column, month, year):
+    return between(column, *month_range(month, year))
+
+
+def in_year(column, year):
+    return between(column, *year_range(year))
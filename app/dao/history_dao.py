@@ -0,0 +1,80 @@
+from app.models import ReceptionSlip, RepairSlip, RepairDetail, Invoice
+from app.dao.pagination import paginate
+from app import db
+from sqlalchemy.orm import joinedload, selectinload
+
+# Each page of a car's timeline is loaded in three statements whatever its length:
+# slips joined to their repair and technician, then the parts and the invoices of
+# all those repairs, each fetched with a single IN query.
+_TIMELINE_OPTIONS = (
+    joinedload(ReceptionSlip.repair_slip).joinedload(RepairSlip.technician),
+    joinedload(ReceptionSlip.repair_slip)
+        .selectinload(RepairSlip.details).joinedload(RepairDetail.component),
+    joinedload(ReceptionSlip.repair_slip)
+        .selectinload(RepairSlip.invoice).joinedload(Invoice.cashier),
+)
+
+
+def get_history_page(car_id, after=None, before=None, per_page=None):
+    """A page of the car's reception slips, newest first, with repairs, parts and invoices loaded."""
+    query = db.session.query(ReceptionSlip)\
+        .filter(ReceptionSlip.car_id == car_id)\
+        .options(*_TIMELINE_OPTIONS)
+
+    return paginate(
+        query,
+        ReceptionSlip.reception_date,
+        ReceptionSlip.id,
+        key=lambda slip: (slip.reception_date, slip.id),
+        after=after,
+        before=before,
+        per_page=per_page
+    )
+
+
+def _item_dict(detail):
+    return {
+        'id': detail.id,
+        'component': detail.component.name if detail.component else None,
+        'category': detail.category,
+        'quantity': detail.quantity,
+        'price_at_time': detail.price_at_time,
+        'labor_fee': detail.labor_fee or 0,
+        'amount': detail.price_at_time * detail.quantity + (detail.labor_fee or 0),
+    }
+
+
+def _invoice_dict(invoice):
+    return {
+        'id': invoice.id,
+        'created_at': invoice.created_at.isoformat() if invoice.created_at else None,
+        'total_amount': invoice.total_amount,
+        'vat_rate': invoice.vat_rate,
+        'payment_method': invoice.payment_method,
+        'cashier': invoice.cashier.full_name if invoice.cashier else None,
+    }
+
+
+def timeline_entry(slip):
+    """Plain dict for one visit, shared by the history page and its JSON API."""
+    repair = slip.repair_slip
+    entry = {
+        'slip_id': slip.id,
+        'reception_date': slip.reception_date.isoformat() if slip.reception_date else None,
+        'status': slip.status,
+        'description': slip.description,
+        'repair': None,
+    }
+    if repair:
+        items = [_item_dict(detail) for detail in repair.details]
+        entry['repair'] = {
+            'id': repair.id,
+            'technician': repair.technician.full_name if repair.technician else None,
+            'start_date': repair.start_date.isoformat() if repair.start_date else None,
+            'end_date': repair.end_date.isoformat() if repair.end_date else None,
+            'items': items,
+            'parts_total': sum(item['price_at_time'] * item['quantity'] for item in items),
+            'labor_total': sum(item['labor_fee'] for item in items),
+            'invoices': [_invoice_dict(invoice) for invoice in repair.invoice],
+        }
+    return entry
@@ -1,26 +1,172 @@
-from app.models import Invoice, RepairSlip, ReceptionSlip, Car
+from app.models import Invoice, RepairSlip, ReceptionSlip, Car, DailyRevenue
+from app.dao.date_range import in_month
+from app.dao.transaction import save
 from app import db
-from sqlalchemy import func, extract
-from datetime import datetime
+from app.routing import read_replica
+from flask import current_app
+from sqlalchemy import func, insert, update
+from collections import OrderedDict
+from threading import Lock
+from datetime import datetime, date
+import json
 
+_html_cache = OrderedDict()
+_lock = Lock()
 
-def create_invoice(repair_slip_id, cashier_id, total_amount, vat_rate):
+
+def _to_date(value):
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _add_daily_revenue(revenue_date, amount):
+    # INSERT IGNORE / INSERT OR IGNORE then increment: concurrent first payments of the day cannot collide.
+    db.session.execute(
+        insert(DailyRevenue)
+        .values(revenue_date=revenue_date, total_amount=0, invoice_count=0)
+        .prefix_with('IGNORE', dialect='mysql')
+        .prefix_with('OR IGNORE', dialect='sqlite')
+    )
+    db.session.execute(
+        update(DailyRevenue)
+        .where(DailyRevenue.revenue_date == revenue_date)
+        .values(
+            total_amount=DailyRevenue.total_amount + amount,
+            invoice_count=DailyRevenue.invoice_count + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def invoice_totals(items, vat_rate):
+    """(subtotal, vat_amount, total_amount) for line items with price_at_time, quantity and labor_fee."""
+    subtotal = float(sum(item.price_at_time * item.quantity + (item.labor_fee or 0) for item in items))
+    vat_amount = subtotal * (vat_rate / 100)
+    return subtotal, vat_amount, subtotal + vat_amount
+
+
+def build_snapshot(repair, items, vat_rate, issued_at):
+    """Everything the printed invoice shows, frozen at payment time.
+
+    `repair` and `items` are view_dao.RepairView and ItemView rows.
+    """
+    subtotal, vat_amount, total_amount = invoice_totals(items, vat_rate)
+    return {
+        'repair': {
+            'repair_id': repair.repair_id,
+            'reception_id': repair.reception_id,
+            'status': 'paid',
+            'description': repair.description,
+            'reception_date': repair.reception_date.isoformat() if repair.reception_date else None,
+            'license_plate': repair.license_plate,
+            'owner_name': repair.owner_name,
+            'phone_number': repair.phone_number,
+            'address': repair.address,
+            'vehicle_type': repair.vehicle_type,
+            'color': repair.color,
+        },
+        'items': [{
+            'category': item.category,
+            'name': item.name,
+            'quantity': item.quantity,
+            'price_at_time': item.price_at_time,
+            'labor_fee': item.labor_fee or 0,
+        } for item in items],
+        'subtotal': subtotal,
+        'vat_rate': vat_rate,
+        'vat_amount': vat_amount,
+        'total_amount': total_amount,
+        'issued_at': issued_at.isoformat(),
+    }
+
+
+def create_invoice(repair_slip_id, cashier_id, total_amount, vat_rate, snapshot=None, commit=True):
     invoice = Invoice(
         repair_slip_id=repair_slip_id,
         cashier_id=cashier_id,
         total_amount=total_amount,
         vat_rate=vat_rate,
-        created_at=datetime.now()
+        created_at=datetime.fromisoformat(snapshot['issued_at']) if snapshot else datetime.now(),
+        snapshot=json.dumps(snapshot) if snapshot else None
     )
     db.session.add(invoice)
-    db.session.commit()
+    _add_daily_revenue(invoice.created_at.date(), total_amount)
+    save(commit)
     return invoice
 
 
+def rebuild_daily_revenue():
+    day = func.date(Invoice.created_at)
+    results = db.session.query(
+        day.label('day'),
+        func.sum(Invoice.total_amount).label('total'),
+        func.count(Invoice.id).label('count')
+    ).group_by(day).all()
+
+    DailyRevenue.query.delete(synchronize_session=False)
+    db.session.add_all([
+        DailyRevenue(
+            revenue_date=_to_date(r.day),
+            total_amount=float(r.total or 0),
+            invoice_count=r.count
+        )
+        for r in results
+    ])
+    db.session.commit()
+    return len(results)
+
+
 def get_invoice_by_repair_id(repair_id):
     return Invoice.query.filter(Invoice.repair_slip_id == repair_id).first()
 
 
+def get_invoice_id_by_repair_id(repair_id):
+    return db.session.query(Invoice.id).filter(Invoice.repair_slip_id == repair_id).scalar()
+
+
+def get_invoice_snapshot(invoice_id):
+    """The stored snapshot of a paid invoice, or None for invoices created before snapshots existed."""
+    value = db.session.query(Invoice.snapshot).filter(Invoice.id == invoice_id).scalar()
+    if not value:
+        return None
+    snapshot = json.loads(value)
+    repair = snapshot['repair']
+    if repair['reception_date']:
+        repair['reception_date'] = datetime.fromisoformat(repair['reception_date'])
+    snapshot['issued_at'] = datetime.fromisoformat(snapshot['issued_at'])
+    return snapshot
+
+
+def get_invoice_html(invoice_id, render):
+    """Rendered invoice document for a paid invoice, cached by id.
+
+    Paid invoices never change, so entries are only evicted by size.
+    `render(invoice_id)` produces the HTML on a miss, or None if there is no such invoice.
+    """
+    with _lock:
+        html = _html_cache.get(invoice_id)
+        if html is not None:
+            _html_cache.move_to_end(invoice_id)
+            return html
+
+    html = render(invoice_id)
+    if html is None:
+        return None
+    max_size = current_app.config.get('INVOICE_CACHE_SIZE', 256)
+    with _lock:
+        _html_cache[invoice_id] = html
+        _html_cache.move_to_end(invoice_id)
+        while len(_html_cache) > max_size:
+            _html_cache.popitem(last=False)
+    return html
+
+
+def clear_invoice_cache():
+    with _lock:
+        _html_cache.clear()
+
+
 def get_recent_invoices(limit=10):
     return db.session.query(Invoice, Car)\
         .join(RepairSlip, Invoice.repair_slip_id == RepairSlip.id)\
@@ -31,26 +177,21 @@ def get_recent_invoices(limit=10):
         .all()
 
 
+@read_replica
 def get_revenue_by_month(month, year):
-    results = db.session.query(
-        extract('day', Invoice.created_at).label('day'),
-        func.sum(Invoice.total_amount).label('total')
-    ).filter(
-        extract('month', Invoice.created_at) == month,
-        extract('year', Invoice.created_at) == year
-    ).group_by(
-        extract('day', Invoice.created_at)
+    results = DailyRevenue.query.filter(
+        in_month(DailyRevenue.revenue_date, month, year)
     ).all()
-    
-    return {int(r.day): float(r.total) for r in results}
 
+    return {r.revenue_date.day: float(r.total_amount) for r in results}
 
+
+@read_replica
 def get_total_revenue_by_month(month, year):
     result = db.session.query(
-        func.sum(Invoice.total_amount).label('total')
+        func.sum(DailyRevenue.total_amount).label('total')
     ).filter(
-        extract('month', Invoice.created_at) == month,
-        extract('year', Invoice.created_at) == year
+        in_month(DailyRevenue.revenue_date, month, year)
     ).first()
-    
+
     return float(result.total) if result.total else 0.0
@@ -0,0 +1,103 @@
+from flask import current_app
+from sqlalchemy import and_, or_, func, literal, DateTime
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from datetime import datetime
+
+# Stand-in for a missing date, so rows without one still sort, seek and encode into a cursor.
+MISSING_DATE = datetime(1970, 1, 1)
+
+
+class Page:
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(key):
+    value, row_id = key
+    raw = f'{value.isoformat()}|{row_id}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(value), int(row_id)
+    except ValueError:
+        return None
+
+
+def not_null(*columns):
+    """The first non-NULL of `columns`, else MISSING_DATE; keyset paging needs a key that is never NULL."""
+    return func.coalesce(*columns, literal(MISSING_DATE, DateTime))
+
+
+def _seek(date_column, id_column, key, descending):
+    value, row_id = key
+    if descending:
+        return or_(
+            date_column < value,
+            and_(date_column == value, id_column < row_id)
+        )
+    return or_(
+        date_column > value,
+        and_(date_column == value, id_column > row_id)
+    )
+
+
+def paginate(query, date_column, id_column, key, after=None, before=None, per_page=None, descending=True):
+    """Keyset-paginate `query` on (date_column, id_column); `key` maps a result row to that pair.
+
+    date_column must never be NULL (wrap a nullable one in not_null()): a NULL key drops out of
+    the seek comparison, so its rows would be skipped or repeated between pages.
+    """
+    per_page = per_page or current_app.config['PAGE_SIZE']
+    before_key = decode_cursor(before)
+    backwards = before_key is not None
+    cursor_key = before_key if backwards else decode_cursor(after)
+    order_desc = descending != backwards
+
+    if cursor_key:
+        query = query.filter(_seek(date_column, id_column, cursor_key, order_desc))
+    if order_desc:
+        query = query.order_by(date_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(date_column.asc(), id_column.asc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, cursor_key is not None
+
+    if not rows:
+        return Page([])
+
+    return Page(
+        rows,
+        next_cursor=encode_cursor(key(rows[-1])) if has_next else None,
+        prev_cursor=encode_cursor(key(rows[0])) if has_prev else None
+    )
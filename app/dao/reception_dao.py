@@ -1,6 +1,10 @@
-from app.models import ReceptionSlip, Car
+from app.models import ReceptionSlip, Car, DailyReceptionCount
+from app.dao.date_range import on_day, in_month
+from app.dao.pagination import paginate
+from app.dao.transaction import save
 from app import db
-from sqlalchemy import func
+from app.routing import read_replica
+from sqlalchemy import func, insert, update
 from datetime import datetime, date
 
 
@@ -11,6 +15,21 @@ def get_all_slips():
         .all()
 
 
+def get_slips_page(after=None, before=None, per_page=None):
+    query = db.session.query(ReceptionSlip, Car)\
+        .join(Car, ReceptionSlip.car_id == Car.id)
+
+    return paginate(
+        query,
+        ReceptionSlip.reception_date,
+        ReceptionSlip.id,
+        key=lambda row: (row[0].reception_date, row[0].id),
+        after=after,
+        before=before,
+        per_page=per_page
+    )
+
+
 def get_slip_by_id(slip_id):
     return db.session.query(ReceptionSlip, Car)\
         .join(Car, ReceptionSlip.car_id == Car.id)\
@@ -22,19 +41,19 @@ def get_slip_only_by_id(slip_id):
     return ReceptionSlip.query.get(slip_id)
 
 
-def create_slip(car_id, description=None, status='pending'):
+def create_slip(car_id, description=None, status='pending', reception_date=None, commit=True):
     slip = ReceptionSlip(
         car_id=car_id,
         description=description,
         status=status,
-        reception_date=datetime.now()
+        reception_date=reception_date or datetime.now()
     )
     db.session.add(slip)
-    db.session.commit()
+    save(commit)
     return slip
 
 
-def update_slip(slip_id, car_id=None, description=None, status=None):
+def update_slip(slip_id, car_id=None, description=None, status=None, commit=True):
     slip = ReceptionSlip.query.get(slip_id)
     if slip:
         if car_id is not None:
@@ -43,25 +62,84 @@ def update_slip(slip_id, car_id=None, description=None, status=None):
             slip.description = description
         if status is not None:
             slip.status = status
-        db.session.commit()
+        save(commit)
     return slip
 
 
-def update_slip_status(slip_id, status):
+def update_slip_status(slip_id, status, commit=True):
     slip = ReceptionSlip.query.get(slip_id)
     if slip:
         slip.status = status
-        db.session.commit()
+        save(commit)
     return slip
 
 
 def count_today_slips():
-    today = date.today()
+    return count_day_slips(date.today())
+
+
+def _ensure_daily_count(day):
+    # INSERT IGNORE / INSERT OR IGNORE: concurrent first requests of the day cannot collide.
+    db.session.execute(
+        insert(DailyReceptionCount)
+        .values(reception_date=day, slip_count=count_day_slips(day))
+        .prefix_with('IGNORE', dialect='mysql')
+        .prefix_with('OR IGNORE', dialect='sqlite')
+    )
+
+
+def count_day_slips(day):
     return ReceptionSlip.query.filter(
-        func.date(ReceptionSlip.reception_date) == today
+        on_day(ReceptionSlip.reception_date, day)
     ).count()
 
 
+def _claim_daily_slot(limit, day):
+    result = db.session.execute(
+        update(DailyReceptionCount)
+        .where(
+            DailyReceptionCount.reception_date == day,
+            DailyReceptionCount.slip_count < limit
+        )
+        .values(slip_count=DailyReceptionCount.slip_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def reserve_daily_slot(limit, day=None):
+    """Claim one of today's `limit` reception slots with a conditional increment; False when full."""
+    day = day or date.today()
+    if _claim_daily_slot(limit, day):
+        return True
+
+    # Nothing claimed: the day is full, or this is its first reception and the counter
+    # row has to be seeded from the slips already recorded.
+    if db.session.get(DailyReceptionCount, day) is not None:
+        return False
+    _ensure_daily_count(day)
+    return _claim_daily_slot(limit, day)
+
+
+def get_daily_count(day=None):
+    day = day or date.today()
+    count = db.session.query(DailyReceptionCount.slip_count)\
+        .filter(DailyReceptionCount.reception_date == day)\
+        .scalar()
+    return count if count is not None else count_day_slips(day)
+
+
+@read_replica
+def count_by_vehicle_type(month, year):
+    return db.session.query(
+        Car.vehicle_type,
+        func.count(ReceptionSlip.id).label('count')
+    ).join(ReceptionSlip, ReceptionSlip.car_id == Car.id)\
+        .filter(in_month(ReceptionSlip.reception_date, month, year))\
+        .group_by(Car.vehicle_type)\
+        .all()
+
+
 def get_slips_by_status(statuses):
     return db.session.query(ReceptionSlip, Car)\
         .join(Car, ReceptionSlip.car_id == Car.id)\
@@ -1,16 +1,30 @@
 from app.models import RepairSlip, RepairDetail, ReceptionSlip, Car, Component
+from app.dao.date_range import in_month
+from app.dao.pagination import Page, paginate, not_null
+from app.dao.transaction import save
+from app.dao import stock_dao
 from app import db
+from app.routing import read_replica
+from flask import current_app
+from sqlalchemy import func, null, union_all
+from collections import OrderedDict
+from threading import Lock
 from datetime import datetime
+import time
 
+# First page of each technician's queue, reused by the detail/edit modals.
+_queue_cache = OrderedDict()
+_queue_cache_lock = Lock()
 
-def create_repair_slip(reception_slip_id, technician_id):
+
+def create_repair_slip(reception_slip_id, technician_id, commit=True):
     repair = RepairSlip(
         reception_slip_id=reception_slip_id,
         technician_id=technician_id,
         start_date=datetime.now()
     )
     db.session.add(repair)
-    db.session.commit()
+    save(commit)
     return repair
 
 
@@ -42,6 +56,157 @@ def get_repairs_by_technician(technician_id, status=None):
     return query.order_by(RepairSlip.start_date.desc()).all()
 
 
+def _subtotal_column():
+    # Correlated on RepairSlip.id and looked up through the repair_slip_id index for each
+    # returned row, so the cost follows the page size rather than the size of repair_details.
+    subtotal = func.sum(
+        RepairDetail.price_at_time * func.coalesce(RepairDetail.quantity, 0)
+        + func.coalesce(RepairDetail.labor_fee, 0)
+    )
+    return db.session.query(func.coalesce(subtotal, 0))\
+        .filter(RepairDetail.repair_slip_id == RepairSlip.id)\
+        .correlate(RepairSlip)\
+        .scalar_subquery()
+
+
+def get_completed_repairs(statuses=('completed', 'paid'), after=None, before=None, per_page=None):
+    query = db.session.query(
+        ReceptionSlip,
+        Car,
+        RepairSlip,
+        _subtotal_column().label('subtotal')
+    ).join(Car, ReceptionSlip.car_id == Car.id)\
+        .join(RepairSlip, ReceptionSlip.id == RepairSlip.reception_slip_id)\
+        .filter(ReceptionSlip.status.in_(statuses))
+
+    # start_date, unlike end_date, is always set, so the pages can walk its index.
+    return paginate(
+        query,
+        RepairSlip.start_date,
+        RepairSlip.id,
+        key=lambda row: (row[2].start_date, row[2].id),
+        after=after,
+        before=before,
+        per_page=per_page
+    )
+
+
+def get_queue_rows(slip_ids):
+    """One flat row per reception slip with the car, repair and subtotal the queue screens display."""
+    if not slip_ids:
+        return []
+
+    return db.session.query(
+        ReceptionSlip.id.label('id'),
+        ReceptionSlip.status.label('status'),
+        ReceptionSlip.reception_date.label('reception_date'),
+        ReceptionSlip.car_id.label('car_id'),
+        Car.license_plate.label('license_plate'),
+        Car.owner_name.label('owner_name'),
+        Car.phone_number.label('phone_number'),
+        Car.vehicle_type.label('vehicle_type'),
+        Car.color.label('color'),
+        RepairSlip.id.label('repair_id'),
+        RepairSlip.technician_id.label('technician_id'),
+        RepairSlip.start_date.label('start_date'),
+        RepairSlip.end_date.label('end_date'),
+        _subtotal_column().label('total_amount')
+    ).join(Car, ReceptionSlip.car_id == Car.id)\
+        .outerjoin(RepairSlip, RepairSlip.reception_slip_id == ReceptionSlip.id)\
+        .filter(ReceptionSlip.id.in_(slip_ids))\
+        .all()
+
+
+def get_cached_work_queue(key, load):
+    """`load()` cached under `key` for SIDEBAR_CACHE_TTL seconds, keeping the SIDEBAR_CACHE_SIZE most recent keys.
+
+    Invalidated in this process whenever a slip enters or moves through the queue;
+    other workers catch up within the TTL.
+    """
+    ttl = current_app.config['SIDEBAR_CACHE_TTL']
+    max_size = current_app.config['SIDEBAR_CACHE_SIZE']
+    now = time.monotonic()
+
+    with _queue_cache_lock:
+        entry = _queue_cache.get(key)
+        if entry and now - entry[1] < ttl:
+            _queue_cache.move_to_end(key)
+            return entry[0]
+
+    value = load()
+    with _queue_cache_lock:
+        _queue_cache[key] = (value, now)
+        _queue_cache.move_to_end(key)
+        while len(_queue_cache) > max_size:
+            _queue_cache.popitem(last=False)
+    return value
+
+
+def invalidate_work_queue_cache():
+    with _queue_cache_lock:
+        _queue_cache.clear()
+
+
+def get_work_queue(technician_id, include_pending=True, include_repairs=True, repair_status=None,
+                   after=None, before=None, per_page=None, descending=True):
+    selects = []
+
+    if include_pending:
+        selects.append(
+            db.select(
+                ReceptionSlip.id.label('id'),
+                null().label('repair_id'),
+                ReceptionSlip.status.label('status'),
+                Car.license_plate.label('license_plate'),
+                Car.owner_name.label('owner_name'),
+                Car.vehicle_type.label('vehicle_type'),
+                Car.color.label('color'),
+                not_null(ReceptionSlip.reception_date).label('date_display'),
+                ReceptionSlip.reception_date.label('reception_date')
+            ).join(Car, ReceptionSlip.car_id == Car.id)
+            .where(ReceptionSlip.status.in_(['pending', 'waiting']))
+        )
+
+    if include_repairs:
+        repairs = db.select(
+            ReceptionSlip.id.label('id'),
+            RepairSlip.id.label('repair_id'),
+            ReceptionSlip.status.label('status'),
+            Car.license_plate.label('license_plate'),
+            Car.owner_name.label('owner_name'),
+            Car.vehicle_type.label('vehicle_type'),
+            Car.color.label('color'),
+            not_null(RepairSlip.start_date, ReceptionSlip.reception_date).label('date_display'),
+            ReceptionSlip.reception_date.label('reception_date')
+        ).select_from(RepairSlip)\
+            .join(ReceptionSlip, RepairSlip.reception_slip_id == ReceptionSlip.id)\
+            .join(Car, ReceptionSlip.car_id == Car.id)\
+            .where(RepairSlip.technician_id == technician_id)
+
+        if repair_status:
+            repairs = repairs.where(ReceptionSlip.status == repair_status)
+        selects.append(repairs)
+
+    if not selects:
+        return Page([])
+
+    if len(selects) == 1:
+        queue = selects[0].subquery('work_queue')
+    else:
+        queue = union_all(*selects).subquery('work_queue')
+
+    return paginate(
+        db.session.query(queue),
+        queue.c.date_display,
+        queue.c.id,
+        key=lambda row: (row.date_display, row.id),
+        after=after,
+        before=before,
+        per_page=per_page,
+        descending=descending
+    )
+
+
 def get_repair_details(repair_id):
     return db.session.query(RepairDetail, Component)\
         .outerjoin(Component, RepairDetail.component_id == Component.id)\
@@ -53,17 +218,27 @@ def get_repair_details_only(repair_id):
     return RepairDetail.query.filter(RepairDetail.repair_slip_id == repair_id).all()
 
 
-def add_repair_detail(repair_slip_id, component_id, quantity, price_at_time, category=None, labor_fee=0):
+def _check_quantity(quantity):
+    if quantity is None or quantity <= 0:
+        raise ValueError('Quantity must be a positive number')
+
+
+def add_repair_detail(repair_slip_id, component_id, quantity, price_at_time, category=None, labor_fee=0, commit=True):
+    _check_quantity(quantity)
+    component_id = int(component_id) if component_id else None
+    stock_dao.reserve(component_id, quantity)
+
     detail = RepairDetail(
         repair_slip_id=repair_slip_id,
         component_id=component_id,
         quantity=quantity,
         price_at_time=price_at_time,
         category=category,
-        labor_fee=labor_fee
+        labor_fee=labor_fee,
+        stock_reserved=component_id is not None
     )
     db.session.add(detail)
-    db.session.commit()
+    save(commit)
     return detail
 
 
@@ -71,11 +246,22 @@ def get_repair_detail_by_id(detail_id):
     return RepairDetail.query.get(detail_id)
 
 
-def update_repair_detail(detail_id, component_id=None, quantity=None, price_at_time=None, category=None, labor_fee=None):
+def update_repair_detail(detail_id, component_id=None, quantity=None, price_at_time=None, category=None, labor_fee=None, commit=True):
     detail = RepairDetail.query.get(detail_id)
     if detail:
+        new_component_id = int(component_id) if component_id is not None else detail.component_id
+        new_quantity = quantity if quantity is not None else detail.quantity
+        _check_quantity(new_quantity)
+
+        # An unreserved (legacy) detail holds no stock: reserve the new quantity in full.
+        if detail.stock_reserved:
+            stock_dao.adjust(detail.component_id, detail.quantity, new_component_id, new_quantity)
+        else:
+            stock_dao.reserve(new_component_id, new_quantity)
+        detail.stock_reserved = new_component_id is not None
+
         if component_id is not None:
-            detail.component_id = component_id
+            detail.component_id = new_component_id
         if quantity is not None:
             detail.quantity = quantity
         if price_at_time is not None:
@@ -84,23 +270,37 @@ def update_repair_detail(detail_id, component_id=None, quantity=None, price_at_t
             detail.category = category
         if labor_fee is not None:
             detail.labor_fee = labor_fee
-        db.session.commit()
+        save(commit)
     return detail
 
 
-def delete_repair_detail(detail_id):
+def delete_repair_detail(detail_id, commit=True):
     detail = RepairDetail.query.get(detail_id)
     if detail:
         repair_slip_id = detail.repair_slip_id
+        if detail.stock_reserved:
+            stock_dao.release(detail.component_id, detail.quantity or 0)
         db.session.delete(detail)
-        db.session.commit()
+        save(commit)
         return repair_slip_id
     return None
 
 
-def finish_repair(repair_id):
+def finish_repair(repair_id, commit=True):
     repair = RepairSlip.query.get(repair_id)
     if repair:
         repair.end_date = datetime.now()
-        db.session.commit()
+        save(commit)
     return repair
+
+
+@read_replica
+def count_by_category(month, year):
+    return db.session.query(
+        RepairDetail.category,
+        func.count(RepairDetail.id).label('count')
+    ).join(RepairSlip, RepairDetail.repair_slip_id == RepairSlip.id)\
+        .join(ReceptionSlip, RepairSlip.reception_slip_id == ReceptionSlip.id)\
+        .filter(in_month(ReceptionSlip.reception_date, month, year))\
+        .group_by(RepairDetail.category)\
+        .all()
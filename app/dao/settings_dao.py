@@ -1,12 +1,64 @@
+from flask import current_app
 from app.models import SystemSetting
 from app import db
+from sqlalchemy import insert, update
+from threading import Lock
+import time
 
+VERSION_KEY = 'settings_version'
 
-def get_setting(key):
-    setting = SystemSetting.query.filter_by(setting_key=key).first()
+_cache = {
+    'values': None,
+    'version': None,
+    'checked_at': 0.0
+}
+_lock = Lock()
+
+
+def _load_settings():
+    settings = SystemSetting.query.all()
+    values = {s.setting_key: s.setting_value for s in settings}
+    _cache['values'] = values
+    _cache['version'] = values.get(VERSION_KEY)
+    _cache['checked_at'] = time.monotonic()
+    return values
+
+
+def _load_version():
+    setting = SystemSetting.query.filter_by(setting_key=VERSION_KEY).first()
     return setting.setting_value if setting else None
 
 
+def _get_settings():
+    ttl = current_app.config.get('SETTINGS_CACHE_TTL', 30)
+
+    with _lock:
+        if _cache['values'] is None:
+            return _load_settings()
+
+        if time.monotonic() - _cache['checked_at'] < ttl:
+            return _cache['values']
+
+        # Another worker may have written since our last check; reload only when the version moved.
+        if _load_version() != _cache['version']:
+            return _load_settings()
+
+        _cache['checked_at'] = time.monotonic()
+        return _cache['values']
+
+
+def clear_cache():
+    with _lock:
+        _cache['values'] = None
+        _cache['version'] = None
+        _cache['checked_at'] = 0.0
+
+
+def get_setting(key, default=None):
+    value = _get_settings().get(key)
+    return value if value is not None else default
+
+
 def get_setting_int(key, default=0):
     value = get_setting(key)
     return int(value) if value else default
@@ -17,35 +69,55 @@ def get_setting_float(key, default=0.0):
     return float(value) if value else default
 
 
+def _write_setting(key, value):
+    # INSERT IGNORE / INSERT OR IGNORE then overwrite: two workers creating the same key cannot collide.
+    db.session.execute(
+        insert(SystemSetting)
+        .values(setting_key=key, setting_value=value)
+        .prefix_with('IGNORE', dialect='mysql')
+        .prefix_with('OR IGNORE', dialect='sqlite')
+    )
+    db.session.execute(
+        update(SystemSetting)
+        .where(SystemSetting.setting_key == key)
+        .values(setting_value=value)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _bump_version():
+    _write_setting(VERSION_KEY, str(time.time_ns()))
+
+
 def set_setting(key, value):
-    setting = SystemSetting.query.filter_by(setting_key=key).first()
-    if setting:
-        setting.setting_value = str(value)
-    else:
-        setting = SystemSetting(setting_key=key, setting_value=str(value))
-        db.session.add(setting)
+    _write_setting(key, str(value))
+    _bump_version()
     db.session.commit()
-    return setting
 
-def get_all_settings():
-    settings = SystemSetting.query.all()
-    return {s.setting_key: s.setting_value for s in settings}
+    with _lock:
+        _load_settings()
+    return db.session.get(SystemSetting, key)
+
 
+def get_live_setting(key, default=None):
+    """Read `key` straight from the table, for values written with set_live_setting()."""
+    value = db.session.query(SystemSetting.setting_value)\
+        .filter(SystemSetting.setting_key == key)\
+        .scalar()
+    return value if value is not None else default
 
-class SettingsDAO:
 
-    @staticmethod
-    def get_setting(key, default=None):
-        setting = SystemSetting.query.filter_by(setting_key=key).first()
-        return setting.setting_value if setting else default
+def set_live_setting(key, value):
+    """Store a value that changes often (a counter) without bumping the version.
+
+    Every worker would otherwise reload its whole settings cache on each change;
+    readers use get_live_setting() instead of the cache.
+    """
+    _write_setting(key, str(value))
+    db.session.commit()
 
-    @staticmethod
-    def set_setting(key, value):
-        setting = SystemSetting.query.filter_by(setting_key=key).first()
-        if setting:
-            setting.setting_value = value
-        else:
-            setting = SystemSetting(setting_key=key, setting_value=value)
-            db.session.add(setting)
 
-        db.session.commit()
\ No newline at end of file
+def get_all_settings():
+    settings = dict(_get_settings())
+    settings.pop(VERSION_KEY, None)
+    return settings
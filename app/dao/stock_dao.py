@@ -0,0 +1,59 @@
+from app.models import Component
+from app import db
+from sqlalchemy import update, func
+
+
+class InsufficientStockError(Exception):
+
+    def __init__(self, component_id, quantity):
+        super().__init__(f'Not enough stock for component #{component_id} (requested {quantity})')
+        self.component_id = component_id
+        self.quantity = quantity
+
+
+def reserve(component_id, quantity):
+    """Take `quantity` units out of stock in one conditional UPDATE; refuses to go below zero."""
+    if not component_id or quantity <= 0:
+        return
+
+    result = db.session.execute(
+        update(Component)
+        .where(
+            Component.id == component_id,
+            Component.is_deleted == False,
+            Component.stock_quantity >= quantity
+        )
+        .values(stock_quantity=Component.stock_quantity - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise InsufficientStockError(component_id, quantity)
+
+
+def release(component_id, quantity):
+    if not component_id or quantity <= 0:
+        return
+
+    db.session.execute(
+        update(Component)
+        .where(Component.id == component_id)
+        .values(stock_quantity=func.coalesce(Component.stock_quantity, 0) + quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def adjust(old_component_id, old_quantity, new_component_id, new_quantity):
+    """Move a reservation from (old component, quantity) to (new component, quantity).
+
+    The new reservation is taken first, so a refusal leaves stock untouched.
+    """
+    if old_component_id == new_component_id:
+        delta = (new_quantity or 0) - (old_quantity or 0)
+        if delta > 0:
+            reserve(new_component_id, delta)
+        elif delta < 0:
+            release(old_component_id, -delta)
+        return
+
+    reserve(new_component_id, new_quantity or 0)
+    release(old_component_id, old_quantity or 0)
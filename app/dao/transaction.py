@@ -0,0 +1,37 @@
+from app import db
+from contextlib import contextmanager
+
+_DEPTH_KEY = 'unit_of_work_depth'
+
+
+@contextmanager
+def unit_of_work():
+    """Run several DAO calls as one transaction: commit once on success, roll back on error.
+
+    Nested blocks join the outermost one, so only the outermost block commits.
+    """
+    info = db.session.info
+    depth = info.get(_DEPTH_KEY, 0)
+    info[_DEPTH_KEY] = depth + 1
+    try:
+        yield db.session
+        if depth == 0:
+            db.session.commit()
+    except Exception:
+        if depth == 0:
+            db.session.rollback()
+        raise
+    finally:
+        info[_DEPTH_KEY] = depth
+
+
+def in_unit_of_work():
+    return db.session.info.get(_DEPTH_KEY, 0) > 0
+
+
+def save(commit=True):
+    """Commit unless the caller opted out or an enclosing unit of work will commit; flush otherwise."""
+    if commit and not in_unit_of_work():
+        db.session.commit()
+    else:
+        db.session.flush()
@@ -1,11 +1,70 @@
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event
 from app.models import User
 from app import db
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+class SessionUser(UserMixin):
+    """Detached, read-only copy of a User row, safe to keep across requests."""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.role = user.role
+        self.full_name = user.full_name
+
+    def __str__(self):
+        return self.username
+
+
+_user_cache = OrderedDict()
+_lock = Lock()
 
 
 def get_user_by_id(user_id):
     return User.query.get(user_id)
 
 
+def get_session_user(user_id):
+    ttl = current_app.config.get('USER_CACHE_TTL', 300)
+    max_size = current_app.config.get('USER_CACHE_SIZE', 256)
+    now = time.monotonic()
+
+    with _lock:
+        entry = _user_cache.get(user_id)
+        if entry and now - entry[1] < ttl:
+            _user_cache.move_to_end(user_id)
+            return entry[0]
+
+    user = User.query.get(user_id)
+    if not user:
+        invalidate_user(user_id)
+        return None
+
+    session_user = SessionUser(user)
+    with _lock:
+        _user_cache[user_id] = (session_user, now)
+        _user_cache.move_to_end(user_id)
+        while len(_user_cache) > max_size:
+            _user_cache.popitem(last=False)
+    return session_user
+
+
+def invalidate_user(user_id):
+    with _lock:
+        _user_cache.pop(user_id, None)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.id)
+
+
 def auth_user(username, password):
     return User.query.filter(
         User.username == username,
@@ -0,0 +1,92 @@
+from app.models import ReceptionSlip, RepairSlip, RepairDetail, Car, Component
+from app import db
+from collections import namedtuple
+
+# Read-only rows for the detail pages: only the columns the templates render,
+# fetched as plain tuples so they never enter the session identity map.
+
+RepairView = namedtuple('RepairView', [
+    'repair_id', 'reception_id', 'status', 'description', 'reception_date',
+    'license_plate', 'owner_name', 'phone_number', 'address', 'vehicle_type', 'color'
+])
+
+ItemView = namedtuple('ItemView', [
+    'id', 'repair_slip_id', 'component_id', 'quantity', 'price_at_time',
+    'category', 'labor_fee', 'name', 'price'
+])
+
+SlipView = namedtuple('SlipView', [
+    'id', 'car_id', 'reception_date', 'status', 'description', 'license_plate',
+    'owner_name', 'phone_number', 'vehicle_type', 'address', 'email', 'color'
+])
+
+
+def _repair_view_query():
+    return db.session.query(
+        RepairSlip.id,
+        ReceptionSlip.id,
+        ReceptionSlip.status,
+        ReceptionSlip.description,
+        ReceptionSlip.reception_date,
+        Car.license_plate,
+        Car.owner_name,
+        Car.phone_number,
+        Car.address,
+        Car.vehicle_type,
+        Car.color
+    ).select_from(ReceptionSlip)\
+        .join(Car, ReceptionSlip.car_id == Car.id)\
+        .outerjoin(RepairSlip, RepairSlip.reception_slip_id == ReceptionSlip.id)
+
+
+def get_repair_view(repair_id):
+    row = _repair_view_query().filter(RepairSlip.id == repair_id).first()
+    return RepairView._make(row) if row else None
+
+
+def get_repair_view_by_slip(slip_id):
+    row = _repair_view_query().filter(ReceptionSlip.id == slip_id).first()
+    return RepairView._make(row) if row else None
+
+
+def get_item_views(repair_id):
+    if repair_id is None:
+        return []
+
+    rows = db.session.query(
+        RepairDetail.id,
+        RepairDetail.repair_slip_id,
+        RepairDetail.component_id,
+        RepairDetail.quantity,
+        RepairDetail.price_at_time,
+        RepairDetail.category,
+        RepairDetail.labor_fee,
+        Component.name,
+        Component.current_price
+    ).outerjoin(Component, RepairDetail.component_id == Component.id)\
+        .filter(RepairDetail.repair_slip_id == repair_id)\
+        .order_by(RepairDetail.id.asc())\
+        .all()
+
+    return [ItemView._make(row) for row in rows]
+
+
+def get_slip_view(slip_id):
+    row = db.session.query(
+        ReceptionSlip.id,
+        ReceptionSlip.car_id,
+        ReceptionSlip.reception_date,
+        ReceptionSlip.status,
+        ReceptionSlip.description,
+        Car.license_plate,
+        Car.owner_name,
+        Car.phone_number,
+        Car.vehicle_type,
+        Car.address,
+        Car.email,
+        Car.color
+    ).join(Car, ReceptionSlip.car_id == Car.id)\
+        .filter(ReceptionSlip.id == slip_id)\
+        .first()
+
+    return SlipView._make(row) if row else None
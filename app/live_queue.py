@@ -0,0 +1,135 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from collections import deque
+from threading import Condition
+import json
+import time
+
+_CHANGES_KEY = 'live_queue_changes'
+_FETCH_KEY = 'live_queue_fetch'
+
+_events = deque(maxlen=500)
+_changed = Condition()
+_state = {'seq': 0}
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_status(session, flush_context):
+    from app.models import ReceptionSlip
+
+    changes = session.info.setdefault(_CHANGES_KEY, {})
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, ReceptionSlip):
+            continue
+
+        if obj in session.new:
+            old, new = None, obj.status
+        elif obj in session.deleted:
+            old, new = obj.status, None
+        else:
+            history = inspect(obj).attrs.status.history
+            if not history.has_changes():
+                continue
+            old = history.deleted[0] if history.deleted else None
+            new = obj.status
+
+        # Several flushes in one transaction collapse into a single first -> last transition.
+        change = changes.setdefault(obj.id, {'slip_id': obj.id, 'old_status': old})
+        change['new_status'] = new
+        if new is not None:
+            session.info.setdefault(_FETCH_KEY, set()).add(obj.id)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _load_rows(session, flush_context):
+    slip_ids = session.info.pop(_FETCH_KEY, None)
+    if not slip_ids:
+        return
+
+    from app.dao import repair_dao
+
+    changes = session.info[_CHANGES_KEY]
+    for row in repair_dao.get_queue_rows(slip_ids):
+        changes[row.id]['row'] = row._asdict()
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_changes(session):
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if changes:
+        publish([c for c in changes.values() if c['old_status'] != c['new_status']])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_CHANGES_KEY, None)
+    session.info.pop(_FETCH_KEY, None)
+
+
+def publish(changes):
+    if not changes:
+        return
+    with _changed:
+        for change in changes:
+            _state['seq'] += 1
+            _events.append((_state['seq'], change))
+        _changed.notify_all()
+
+
+def current_seq():
+    return _state['seq']
+
+
+def queue_delta(change, in_view):
+    """Turn a status change into the delta a screen needs: added, moved, removed, or None if unaffected.
+
+    `in_view(status, row)` says whether a slip with that status belongs on the screen.
+    """
+    row = change.get('row')
+    was = change['old_status'] is not None and row is not None and in_view(change['old_status'], row)
+    now = change['new_status'] is not None and row is not None and in_view(change['new_status'], row)
+
+    if was and now:
+        return 'moved'
+    if now:
+        return 'added'
+    if was or (row is None and change['old_status'] is not None):
+        return 'removed'
+    return None
+
+
+def event_stream(since, render, timeout, keepalive=15):
+    """Yield SSE messages for queue changes after sequence `since`.
+
+    `render(change)` returns a JSON-serialisable delta for this client, or None
+    when the change does not affect its screen. If the client fell behind the
+    in-memory buffer a `reset` event asks it to reload.
+    """
+    deadline = time.monotonic() + timeout
+    yield 'retry: 3000\n\n'
+
+    while True:
+        with _changed:
+            if _state['seq'] == since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                _changed.wait(min(keepalive, remaining))
+            latest = _state['seq']
+            oldest = _events[0][0] if _events else latest + 1
+            pending = [(seq, change) for seq, change in _events if seq > since]
+
+        if since > latest or since < oldest - 1:
+            yield f'id: {latest}\nevent: reset\ndata: {{}}\n\n'
+            return
+
+        sent = False
+        for seq, change in pending:
+            delta = render(change)
+            if delta is not None:
+                yield f'id: {seq}\nevent: queue\ndata: {json.dumps(delta)}\n\n'
+                sent = True
+        if not sent:
+            # Advance the client's Last-Event-ID past changes it did not need.
+            yield f'id: {latest}\n\n'
+        since = latest
@@ -0,0 +1,136 @@
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.elements import BindParameter
+from threading import Condition
+import json
+import time
+
+COUNT_KEY = 'low_stock_count'
+THRESHOLD_KEY = 'low_stock_threshold'
+
+_CHANGED_KEY = 'low_stock_changed'
+_changed = Condition()
+_state = {'count': None, 'version': 0}
+
+
+def _touches_low_stock(obj):
+    from app.models import Component, SystemSetting
+
+    if isinstance(obj, Component):
+        return True
+    return isinstance(obj, SystemSetting) and obj.setting_key == THRESHOLD_KEY
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    if any(_touches_low_stock(obj) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_CHANGED_KEY] = True
+
+
+def _writes_threshold(orm_execute_state):
+    params = orm_execute_state.parameters
+    rows = params if isinstance(params, list) else [params or {}]
+    if any(row.get('setting_key') == THRESHOLD_KEY for row in rows):
+        return True
+    # insert().values(...) and update().where(...) carry the key as a bound literal instead.
+    return any(isinstance(element, BindParameter) and element.value == THRESHOLD_KEY
+               for element in visitors.iterate(orm_execute_state.statement))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_write(orm_execute_state):
+    from app.models import Component, SystemSetting
+
+    # Bulk UPDATE/INSERT statements (stock reservations, CSV imports, settings_dao writes) bypass the flush.
+    if not (orm_execute_state.is_update or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is Component.__mapper__ or (
+            mapper is SystemSetting.__mapper__ and _writes_threshold(orm_execute_state)):
+        orm_execute_state.session.info[_CHANGED_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _schedule_refresh(session):
+    if session.info.pop(_CHANGED_KEY, False) and has_app_context():
+        g.low_stock_changed = True
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_CHANGED_KEY, None)
+
+
+def _publish(count):
+    with _changed:
+        _state['count'] = count
+        _state['version'] += 1
+        _changed.notify_all()
+
+
+def refresh_low_stock_count():
+    """Recount low-stock components and store the result; listeners are woken only if it changed."""
+    from app.dao import settings_dao
+    from app.dao.component_dao import ComponentDAO
+
+    count = ComponentDAO.count_low_stock_components()
+    if settings_dao.get_live_setting(COUNT_KEY) != str(count):
+        settings_dao.set_live_setting(COUNT_KEY, count)
+    if count != _state['count']:
+        _publish(count)
+    return count
+
+
+def get_low_stock_count():
+    from app.dao import settings_dao
+
+    value = settings_dao.get_live_setting(COUNT_KEY)
+    if value is None:
+        return refresh_low_stock_count()
+    return int(value)
+
+
+def event_stream(timeout, poll_interval):
+    """Yield SSE messages whenever the count changes, for at most `timeout` seconds.
+
+    Changes committed in this process wake the stream immediately; changes from
+    other workers are picked up by re-reading the stored count every `poll_interval`.
+    """
+    from app import db
+
+    deadline = time.monotonic() + timeout
+    last_count = None
+    yield 'retry: 5000\n\n'
+
+    while time.monotonic() < deadline:
+        with _changed:
+            seen = _state['version']
+        count = get_low_stock_count()
+        # Don't hold a pooled connection while idle.
+        db.session.remove()
+
+        if count != last_count:
+            last_count = count
+            yield f"event: low-stock\ndata: {json.dumps({'count': count})}\n\n"
+        else:
+            yield ': keep-alive\n\n'
+
+        with _changed:
+            if _state['version'] == seen:
+                _changed.wait(min(poll_interval, max(deadline - time.monotonic(), 0)))
+
+
+def init_low_stock(app):
+    app.config.setdefault('LOW_STOCK_STREAM_TIMEOUT', 300)
+    app.config.setdefault('LOW_STOCK_STREAM_POLL', 15)
+
+    @app.after_request
+    def refresh_after_write(response):
+        if g.pop('low_stock_changed', False):
+            try:
+                refresh_low_stock_count()
+            except Exception:
+                app.logger.exception('Failed to refresh the low-stock count')
+        return response
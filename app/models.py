@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Float, Enum, DateTime
-from sqlalchemy.orm import relationship
-from app import db, app
+from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, Float, Enum, DateTime, Date, Index
+from sqlalchemy.orm import relationship, validates
+from app import db
+from app.normalize import normalize_plate, plate_number, normalize_phone, normalize_name, name_tokens
 from flask_login import UserMixin
 from enum import Enum as PyEnum
 from datetime import datetime
@@ -34,6 +35,11 @@ class User(db.Model, UserMixin):
         return self.username
 
 
+def _search_key(length):
+    # NOCASE lets SQLite use the index for LIKE 'prefix%'; MySQL's default collation is already case-insensitive.
+    return String(length).with_variant(String(length, collation='NOCASE'), 'sqlite')
+
+
 class Car(db.Model):
     __tablename__ = 'cars'
     
@@ -45,19 +51,55 @@ class Car(db.Model):
     email = Column(String(100))
     vehicle_type = Column(String(50))
     color = Column(String(50))
+
+    # Normalized copies used by the search (see app.normalize), kept in sync by the validators below
+    plate_key = Column(_search_key(20), index=True)
+    plate_number = Column(_search_key(20), index=True)
+    phone_key = Column(_search_key(20), index=True)
+    owner_key = Column(_search_key(100), index=True)
     
     reception_slips = relationship('ReceptionSlip', backref='car', lazy=True)
+    name_tokens = relationship('CarNameToken', cascade='all, delete-orphan', lazy=True)
+
+    @validates('license_plate')
+    def _set_plate_keys(self, key, value):
+        self.plate_key = normalize_plate(value)
+        self.plate_number = plate_number(self.plate_key)
+        return value
+
+    @validates('phone_number')
+    def _set_phone_key(self, key, value):
+        self.phone_key = normalize_phone(value)
+        return value
+
+    @validates('owner_name')
+    def _set_owner_key(self, key, value):
+        self.owner_key = normalize_name(value)
+        tokens = name_tokens(self.owner_key)
+        if self.id is None or sorted(t.token for t in self.name_tokens) != tokens:
+            self.name_tokens = [CarNameToken(token=token) for token in tokens]
+        return value
 
     def __str__(self):
         return self.license_plate
 
 
+class CarNameToken(db.Model):
+    """One word of a car's normalized owner name, so matching a given or middle name is an index lookup."""
+    __tablename__ = 'car_name_tokens'
+
+    car_id = Column(Integer, ForeignKey('cars.id'), primary_key=True)
+    token = Column(_search_key(50), primary_key=True)
+
+    __table_args__ = (Index('ix_car_name_tokens_token', 'token', 'car_id'),)
+
+
 class ReceptionSlip(db.Model):
     __tablename__ = 'reception_slips'
     
     id = Column(Integer, primary_key=True)
-    car_id = Column(Integer, ForeignKey('cars.id'), nullable=False)
-    reception_date = Column(DateTime, default=datetime.now)
+    car_id = Column(Integer, ForeignKey('cars.id'), nullable=False, index=True)
+    reception_date = Column(DateTime, default=datetime.now, index=True)
     status = Column(String(20), default='pending')  # pending, waiting, repairing, completed, paid
     description = Column(Text)
     
@@ -67,6 +109,16 @@ class ReceptionSlip(db.Model):
         return f"Slip #{self.id}"
 
 
+class DailyReceptionCount(db.Model):
+    __tablename__ = 'daily_reception_counts'
+
+    reception_date = Column(Date, primary_key=True)
+    slip_count = Column(Integer, nullable=False, default=0)
+
+    def __str__(self):
+        return f"{self.reception_date}: {self.slip_count}"
+
+
 class Component(db.Model):
     __tablename__ = 'components'
     
@@ -80,14 +132,30 @@ class Component(db.Model):
         return self.name
 
 
+class ComponentPriceHistory(db.Model):
+    __tablename__ = 'component_price_history'
+
+    id = Column(Integer, primary_key=True)
+    component_id = Column(Integer, ForeignKey('components.id'), nullable=False, index=True)
+    old_price = Column(Float)
+    new_price = Column(Float, nullable=False)
+    changed_at = Column(DateTime, default=datetime.now)
+    changed_by = Column(Integer, ForeignKey('users.id'))
+
+    component = relationship('Component', backref='price_history', lazy=True)
+
+    def __str__(self):
+        return f"{self.component_id}: {self.old_price} -> {self.new_price}"
+
+
 class RepairSlip(db.Model):
     __tablename__ = 'repair_slips'
     
     id = Column(Integer, primary_key=True)
-    reception_slip_id = Column(Integer, ForeignKey('reception_slips.id'), nullable=False)
+    reception_slip_id = Column(Integer, ForeignKey('reception_slips.id'), nullable=False, index=True)
     technician_id = Column(Integer, ForeignKey('users.id'))
-    start_date = Column(DateTime, default=datetime.now)
-    end_date = Column(DateTime)
+    start_date = Column(DateTime, default=datetime.now, index=True)
+    end_date = Column(DateTime, index=True)
     
     technician = relationship('User', backref='repairs', lazy=True)
     details = relationship('RepairDetail', backref='repair_slip', lazy=True)
@@ -100,12 +168,15 @@ class RepairDetail(db.Model):
     __tablename__ = 'repair_details'
     
     id = Column(Integer, primary_key=True)
-    repair_slip_id = Column(Integer, ForeignKey('repair_slips.id'), nullable=False)
+    repair_slip_id = Column(Integer, ForeignKey('repair_slips.id'), nullable=False, index=True)
     component_id = Column(Integer, ForeignKey('components.id'), nullable=True)
     quantity = Column(Integer, default=1)
     price_at_time = Column(Float, nullable=False)
     category = Column(String(250))
     labor_fee = Column(Float, default=0)
+    # Whether `quantity` was taken out of the component's stock (details created before
+    # stock reservations existed were not, and must not be released)
+    stock_reserved = Column(Boolean, nullable=False, default=False, server_default='0')
     
     component = relationship('Component', lazy=True)
 
@@ -117,12 +188,15 @@ class Invoice(db.Model):
     __tablename__ = 'invoices'
     
     id = Column(Integer, primary_key=True)
-    repair_slip_id = Column(Integer, ForeignKey('repair_slips.id'), nullable=False)
+    # Unique: a repair is invoiced once, even if two payments are posted at the same time
+    repair_slip_id = Column(Integer, ForeignKey('repair_slips.id'), nullable=False, unique=True, index=True)
     cashier_id = Column(Integer, ForeignKey('users.id'))
     total_amount = Column(Float, nullable=False)
     vat_rate = Column(Float, default=10.0)
-    created_at = Column(DateTime, default=datetime.now)
+    created_at = Column(DateTime, default=datetime.now, index=True)
     payment_method = Column(String(50), default='cash')
+    # JSON copy of the customer, vehicle, line items and totals as charged (see invoice_dao.build_snapshot)
+    snapshot = Column(Text)
     
     repair_slip = relationship('RepairSlip', backref='invoice', lazy=True)
     cashier = relationship('User', lazy=True)
@@ -131,6 +205,17 @@ class Invoice(db.Model):
         return f"Invoice #{self.id}"
 
 
+class DailyRevenue(db.Model):
+    __tablename__ = 'daily_revenues'
+
+    revenue_date = Column(Date, primary_key=True)
+    total_amount = Column(Float, nullable=False, default=0)
+    invoice_count = Column(Integer, nullable=False, default=0)
+
+    def __str__(self):
+        return f"{self.revenue_date}: {self.total_amount}"
+
+
 class SystemSetting(db.Model):
     __tablename__ = 'system_settings'
     
@@ -0,0 +1,49 @@
+import re
+import unicodedata
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]')
+_NON_DIGIT = re.compile(r'\D')
+_TRAILING_DIGITS = re.compile(r'\d+$')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_plate(value):
+    """'51a-123.45' -> '51A12345'; separators and case are ignored when matching plates."""
+    return _NON_ALNUM.sub('', (value or '').upper())
+
+
+def plate_number(plate_key):
+    """The serial part of a normalized plate ('51A12345' -> '12345'), what customers usually remember."""
+    match = _TRAILING_DIGITS.search(plate_key or '')
+    return match.group() if match else ''
+
+
+def normalize_phone(value):
+    """Digits only, with the +84 country code folded into the local 0 prefix."""
+    digits = _NON_DIGIT.sub('', value or '')
+    if digits.startswith('84') and (len(digits) >= 11 or (value or '').lstrip().startswith('+')):
+        digits = '0' + digits[2:]
+    return digits
+
+
+def normalize_name(value):
+    """Lowercase, without Vietnamese diacritics, single spaced: 'Trần  Đức' -> 'tran duc'."""
+    value = (value or '').replace('đ', 'd').replace('Đ', 'D')
+    value = ''.join(c for c in unicodedata.normalize('NFD', value) if not unicodedata.combining(c))
+    return _SPACES.sub(' ', value).strip().lower()
+
+
+def name_tokens(owner_key):
+    """Words of a normalized owner name after the first, which the owner_key prefix already covers."""
+    return sorted(set(owner_key.split()[1:])) if owner_key else []
+
+
+def car_search_keys(license_plate, owner_name, phone_number):
+    """Column values for Car's search keys, for code that inserts cars without the ORM."""
+    plate_key = normalize_plate(license_plate)
+    return {
+        'plate_key': plate_key,
+        'plate_number': plate_number(plate_key),
+        'owner_key': normalize_name(owner_name),
+        'phone_key': normalize_phone(phone_number),
+    }
@@ -0,0 +1,205 @@
+from flask import g, request, session, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+import json
+import logging
+import re
+import time
+
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+_history = deque(maxlen=200)
+_history_lock = Lock()
+# Budgets opened by the current thread only; queries other threads run concurrently do not count.
+_budgets = ContextVar('perf_query_budgets', default=())
+
+logger = logging.getLogger('app.perf')
+
+
+def statement_shape(statement):
+    """Normalise a SQL statement so queries that differ only in parameters compare equal."""
+    shape = statement
+    for pattern, replacement in _LITERALS:
+        shape = pattern.sub(replacement, shape)
+    return shape.strip()
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements = []
+
+    def record(self, statement, duration):
+        self.query_count += 1
+        self.db_time += duration
+        self.statements.append((statement_shape(statement), duration))
+
+    def slowest(self, limit):
+        return sorted(self.statements, key=lambda s: s[1], reverse=True)[:limit]
+
+    def repeated(self, threshold):
+        counts = Counter(shape for shape, _ in self.statements)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('perf_started_at', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['perf_started_at'].pop()
+    duration = time.perf_counter() - started
+
+    for budget in _budgets.get():
+        budget.record(statement, duration)
+
+    if has_request_context():
+        stats = g.get('perf_stats')
+        if stats is not None:
+            stats.record(statement, duration)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    if context.connection is not None:
+        started = context.connection.info.get('perf_started_at')
+        if started:
+            started.pop()
+
+
+def get_history():
+    with _history_lock:
+        return list(_history)
+
+
+def summarize_history():
+    endpoints = {}
+    for entry in get_history():
+        summary = endpoints.setdefault(entry['endpoint'], {
+            'endpoint': entry['endpoint'],
+            'requests': 0,
+            'max_queries': 0,
+            'total_queries': 0,
+            'total_db_ms': 0.0,
+            'n_plus_one': 0
+        })
+        summary['requests'] += 1
+        summary['total_queries'] += entry['query_count']
+        summary['max_queries'] = max(summary['max_queries'], entry['query_count'])
+        summary['total_db_ms'] += entry['db_ms']
+        if entry['repeated']:
+            summary['n_plus_one'] += 1
+
+    for summary in endpoints.values():
+        summary['avg_queries'] = summary['total_queries'] / summary['requests']
+        summary['avg_db_ms'] = summary['total_db_ms'] / summary['requests']
+    return sorted(endpoints.values(), key=lambda s: s['max_queries'], reverse=True)
+
+
+def _configure_logger(level):
+    logger.setLevel(level)
+    if not logger.handlers:
+        # Own handler so per-request lines show up even when the app logs at WARNING.
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s in perf: %(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+def init_perf(app):
+    app.config.setdefault('PERF_ENABLED', True)
+    # Expose X-DB-* headers to every client; otherwise only in debug mode and to admins.
+    app.config.setdefault('PERF_HEADERS', False)
+    app.config.setdefault('PERF_LOG_LEVEL', 'INFO')
+    app.config.setdefault('PERF_SLOW_QUERIES', 5)
+    app.config.setdefault('PERF_N_PLUS_ONE_THRESHOLD', 5)
+    app.config.setdefault('PERF_HISTORY_SIZE', 200)
+
+    global _history
+    _history = deque(maxlen=app.config['PERF_HISTORY_SIZE'])
+    _configure_logger(app.config['PERF_LOG_LEVEL'])
+
+    def headers_allowed():
+        return app.config['PERF_HEADERS'] or app.debug or session.get('role') == 'admin'
+
+    @app.before_request
+    def start_perf_stats():
+        if app.config['PERF_ENABLED']:
+            g.perf_stats = RequestStats()
+
+    @app.after_request
+    def finish_perf_stats(response):
+        stats = g.pop('perf_stats', None)
+        if stats is None or request.endpoint == 'static':
+            return response
+
+        total_ms = (time.perf_counter() - stats.started_at) * 1000
+        db_ms = stats.db_time * 1000
+        repeated = stats.repeated(app.config['PERF_N_PLUS_ONE_THRESHOLD'])
+
+        if headers_allowed():
+            response.headers['X-DB-Query-Count'] = str(stats.query_count)
+            response.headers['X-DB-Time-Ms'] = f'{db_ms:.1f}'
+            if repeated:
+                response.headers['X-DB-N-Plus-One'] = str(len(repeated))
+
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint or '-',
+            'status': response.status_code,
+            'query_count': stats.query_count,
+            'db_ms': round(db_ms, 2),
+            'total_ms': round(total_ms, 2),
+            'slowest': [
+                {'sql': shape, 'ms': round(duration * 1000, 2)}
+                for shape, duration in stats.slowest(app.config['PERF_SLOW_QUERIES'])
+            ],
+            'repeated': [{'sql': shape, 'count': count} for shape, count in repeated]
+        }
+        with _history_lock:
+            _history.append(entry)
+
+        logger.info('%s', json.dumps({
+            key: entry[key] for key in ('method', 'path', 'status', 'query_count', 'db_ms', 'total_ms')
+        } | {'n_plus_one': len(repeated)}))
+        return response
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries):
+    """Fail if the block issues more than `max_queries` statements, e.g. around a test-client request.
+
+        with query_budget(5):
+            client.get('/admin/accessories')
+    """
+    stats = RequestStats()
+    token = _budgets.set(_budgets.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _budgets.reset(token)
+
+    if stats.query_count > max_queries:
+        shapes = '\n'.join(f'  {count}x {shape}' for shape, count in stats.repeated(2)) or '  (no repeated statements)'
+        raise QueryBudgetExceeded(
+            f'{stats.query_count} queries issued, budget was {max_queries}. Repeated statements:\n{shapes}'
+        )
@@ -0,0 +1,110 @@
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from collections import deque
+from threading import Lock
+import os
+import time
+
+_stats_lock = Lock()
+_stats = {
+    'checkouts': 0,
+    'connects': 0,
+    'timeouts': 0,
+    'max_checked_out': 0,
+}
+_waits = deque(maxlen=1000)
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            with _stats_lock:
+                _stats['timeouts'] += 1
+            raise
+
+        waited = time.perf_counter() - started
+        with _stats_lock:
+            _stats['checkouts'] += 1
+            _stats['max_checked_out'] = max(_stats['max_checked_out'], self.checkedout())
+            _waits.append(waited)
+        return connection
+
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def _count_connect(dbapi_connection, connection_record):
+    with _stats_lock:
+        _stats['connects'] += 1
+
+
+def engine_options(uri):
+    """Build SQLAlchemy engine options from DB_POOL_* environment variables.
+
+    Each worker process owns its own pool, so DB_POOL_SIZE defaults to the
+    number of threads per worker (WEB_THREADS). Keep
+    workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below MySQL's max_connections
+    and DB_POOL_RECYCLE below its wait_timeout.
+    """
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        # In-memory SQLite needs a single shared connection, not a pool.
+        return {}
+
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': _env_int('DB_POOL_SIZE', _env_int('WEB_THREADS', 5)),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
+
+def reset_pool_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+        _waits.clear()
+
+
+def get_pool_stats():
+    from app import db
+
+    pool = db.engine.pool
+    stats = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            # QueuePool counts overflow from -size, so negative means spare capacity.
+            'overflow': max(pool.overflow(), 0),
+        })
+
+    with _stats_lock:
+        stats.update(_stats)
+        waits = sorted(_waits)
+
+    if waits:
+        stats['wait_ms_avg'] = round(sum(waits) / len(waits) * 1000, 3)
+        stats['wait_ms_p95'] = round(waits[int((len(waits) - 1) * 0.95)] * 1000, 3)
+        stats['wait_ms_max'] = round(waits[-1] * 1000, 3)
+    else:
+        stats['wait_ms_avg'] = stats['wait_ms_p95'] = stats['wait_ms_max'] = 0
+    return stats
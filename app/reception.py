@@ -1,5 +1,6 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from app.dao import reception_dao, car_dao, settings_dao
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, make_response
+from app.dao import reception_dao, car_dao, settings_dao, view_dao, history_dao, repair_dao
+from app.dao.transaction import unit_of_work
 from datetime import datetime
 
 reception_bp = Blueprint('reception', __name__)
@@ -12,11 +13,14 @@ def check_reception():
 
 def get_reception_data():
     max_cars = settings_dao.get_setting_int('max_cars_per_day', 30)
-    cars_today_count = reception_dao.count_today_slips()
-    slips_data = reception_dao.get_all_slips()
+    cars_today_count = reception_dao.get_daily_count()
+    page = reception_dao.get_slips_page(
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
 
     slips = []
-    for slip, car in slips_data:
+    for slip, car in page:
         slips.append({
             'id': slip.id,
             'car_id': slip.car_id,
@@ -32,7 +36,7 @@ def get_reception_data():
             'color': car.color
         })
     
-    return max_cars, cars_today_count, slips
+    return max_cars, cars_today_count, slips, page
 
 
 @reception_bp.route('/')
@@ -40,9 +44,20 @@ def home():
     if not check_reception():
         return redirect(url_for('main.login'))
     
-    max_cars, cars_today_count, slips = get_reception_data()
+    max_cars, cars_today_count, slips, page = get_reception_data()
     
-    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars)
+    return render_template('reception/home.html', slips=slips, page=page, cars_today_count=cars_today_count, max_cars=max_cars)
+
+
+@reception_bp.route('/search')
+def search():
+    if not check_reception():
+        return {'success': False, 'message': 'Unauthorized'}
+
+    q = request.args.get('q', '').strip()
+    if len(q) < 2:
+        return {'results': []}
+    return {'results': car_dao.search_cars(q)}
 
 
 @reception_bp.route('/add', methods=['GET', 'POST'])
@@ -52,11 +67,6 @@ def add_car():
     
     if request.method == 'POST':
         max_cars = settings_dao.get_setting_int('max_cars_per_day', 30)
-        current_count = reception_dao.count_today_slips()
-        
-        if current_count >= max_cars:
-            flash(f'Daily limit of {max_cars} cars reached. Cannot receive more cars today.')
-            return redirect(url_for('reception.home'))
 
         license_plate = request.form['license_plate']
         owner_name = request.form['owner_name']
@@ -68,43 +78,44 @@ def add_car():
         color = request.form.get('color', '')
         status = request.form.get('status', 'pending')
 
-        car = car_dao.create_or_update_car(license_plate, owner_name, phone, address, email, vehicle_type, color)
-
         slip_id = request.args.get('slip_id')
+        # One timestamp for both the slot and the slip, so they count against the same day at midnight
+        received_at = datetime.now()
+        with unit_of_work():
+            if not slip_id and not reception_dao.reserve_daily_slot(max_cars, received_at.date()):
+                flash(f'Daily limit of {max_cars} cars reached. Cannot receive more cars today.')
+                return redirect(url_for('reception.home'))
+
+            car = car_dao.create_or_update_car(license_plate, owner_name, phone, address, email, vehicle_type, color, commit=False)
+
+            if slip_id:
+                reception_dao.update_slip(int(slip_id), car.id, description, status, commit=False)
+            else:
+                reception_dao.create_slip(car.id, description, status, reception_date=received_at, commit=False)
+
+        # New and edited slips show up in the technicians' queue sidebar straight away
+        repair_dao.invalidate_work_queue_cache()
+
         if slip_id:
-            reception_dao.update_slip(int(slip_id), car.id, description, status)
             flash('Reception slip updated successfully!')
         else:
-            reception_dao.create_slip(car.id, description, status)
             flash('Car received successfully!')
             
         return redirect(url_for('reception.home'))
 
-    max_cars, cars_today_count, slips = get_reception_data()
+    max_cars, cars_today_count, slips, page = get_reception_data()
 
     slip_id = request.args.get('slip_id')
     slip = None
     if slip_id:
-        result = reception_dao.get_slip_by_id(int(slip_id))
-        if result:
-            s, car = result
-            slip = {
-                'id': s.id,
-                'car_id': s.car_id,
-                'reception_date': s.reception_date,
-                'status': s.status,
-                'description': s.description,
-                'license_plate': car.license_plate,
-                'owner_name': car.owner_name,
-                'phone_number': car.phone_number,
-                'vehicle_type': car.vehicle_type,
-                'address': car.address,
-                'email': car.email,
-                'color': car.color
-            }
+        slip = view_dao.get_slip_view(int(slip_id))
+
+    # Picking a returning customer from the search prefills their details
+    car_id = request.args.get('car_id', type=int)
+    car = car_dao.get_car_by_id(car_id) if car_id and not slip else None
     
     now_date = datetime.now().strftime('%Y-%m-%d')
-    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars, modal='add', slip=slip, now_date=now_date)
+    return render_template('reception/home.html', slips=slips, page=page, cars_today_count=cars_today_count, max_cars=max_cars, modal='add', slip=slip, car=car, now_date=now_date)
 
 
 @reception_bp.route('/detail/<int:slip_id>')
@@ -112,27 +123,67 @@ def detail(slip_id):
     if not check_reception():
         return redirect(url_for('main.login'))
     
-    max_cars, cars_today_count, slips = get_reception_data()
+    max_cars, cars_today_count, slips, page = get_reception_data()
     
-    result = reception_dao.get_slip_by_id(slip_id)
-    if not result:
+    slip = view_dao.get_slip_view(slip_id)
+    if not slip:
         flash('Reception slip not found.')
         return redirect(url_for('reception.home'))
-    
-    s, car = result
-    slip = {
-        'id': s.id,
-        'car_id': s.car_id,
-        'reception_date': s.reception_date,
-        'status': s.status,
-        'description': s.description,
-        'license_plate': car.license_plate,
-        'owner_name': car.owner_name,
-        'phone_number': car.phone_number,
-        'vehicle_type': car.vehicle_type,
-        'address': car.address,
-        'email': car.email,
-        'color': car.color
-    }
         
-    return render_template('reception/home.html', slips=slips, cars_today_count=cars_today_count, max_cars=max_cars, modal='detail', slip=slip)
+    return render_template('reception/home.html', slips=slips, page=page, cars_today_count=cars_today_count, max_cars=max_cars, modal='detail', slip=slip)
+
+
+def get_history(car_id):
+    page = history_dao.get_history_page(
+        car_id,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+    return [history_dao.timeline_entry(slip) for slip in page], page
+
+
+@reception_bp.route('/cars/<int:car_id>/history')
+def history(car_id):
+    if not check_reception():
+        return redirect(url_for('main.login'))
+
+    car = car_dao.get_car_by_id(car_id)
+    if not car:
+        flash('Car not found.')
+        return redirect(url_for('reception.home'))
+
+    entries, page = get_history(car_id)
+
+    if request.args.get('partial'):
+        # "Load older" appends the next page in place instead of reloading the timeline
+        response = make_response(render_template('reception/history_entries.html', entries=entries))
+        if page.has_next:
+            response.headers['X-Next-Cursor'] = page.next_cursor
+        return response
+
+    return render_template('reception/history.html', car=car, entries=entries, page=page)
+
+
+@reception_bp.route('/cars/<int:car_id>/history.json')
+def history_api(car_id):
+    if not check_reception():
+        return {'success': False, 'message': 'Unauthorized'}
+
+    car = car_dao.get_car_by_id(car_id)
+    if not car:
+        return {'success': False, 'message': 'Car not found'}, 404
+
+    entries, page = get_history(car_id)
+    return {
+        'car': {
+            'id': car.id,
+            'license_plate': car.license_plate,
+            'owner_name': car.owner_name,
+            'phone_number': car.phone_number,
+            'vehicle_type': car.vehicle_type,
+            'color': car.color,
+        },
+        'entries': entries,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }
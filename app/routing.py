@@ -0,0 +1,94 @@
+from flask import current_app, has_request_context, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from functools import wraps
+import time
+
+REPLICA_BIND = 'replica'
+LAST_WRITE_KEY = '_db_last_write'
+
+_DEPTH_KEY = 'replica_depth'
+_USED_KEY = 'replica_used'
+_WROTE_KEY = 'replica_wrote'
+
+_replica_state = {'down_until': 0.0}
+
+
+def _replica_allowed(session):
+    from app.dao.transaction import in_unit_of_work
+
+    if session.info.get(_DEPTH_KEY, 0) == 0 or REPLICA_BIND not in session._db.engines:
+        return False
+    if time.monotonic() < _replica_state['down_until']:
+        return False
+    # Anything this session has written must be read back from the primary.
+    if session.info.get(_WROTE_KEY) or in_unit_of_work() or session.new or session.dirty or session.deleted:
+        return False
+    if has_request_context():
+        sticky = current_app.config.get('REPLICA_STICKY_SECONDS', 0)
+        if time.time() - http_session.get(LAST_WRITE_KEY, 0) < sticky:
+            return False
+    return True
+
+
+class RoutingSession(Session):
+    """Session that sends reads made inside read_replica() calls to the replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if getattr(clause, 'is_dml', False):
+                self.info[_WROTE_KEY] = True
+            elif _replica_allowed(self):
+                self.info[_USED_KEY] = True
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if session.info.pop(_WROTE_KEY, False) and has_request_context():
+        # Keep this user's reads on the primary until the replica has caught up.
+        http_session[LAST_WRITE_KEY] = time.time()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop(_WROTE_KEY, None)
+
+
+def mark_replica_down():
+    retry = current_app.config.get('REPLICA_RETRY_SECONDS', 30)
+    _replica_state['down_until'] = time.monotonic() + retry
+
+
+def read_replica(func):
+    """Run a read-only DAO call against the replica, falling back to the primary if it fails."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        from app import db
+
+        info = db.session.info
+        depth = info.get(_DEPTH_KEY, 0)
+        info[_DEPTH_KEY] = depth + 1
+        try:
+            return func(*args, **kwargs)
+        except OperationalError:
+            if depth > 0 or not info.get(_USED_KEY):
+                raise
+            current_app.logger.warning('Read replica unavailable, falling back to primary', exc_info=True)
+            mark_replica_down()
+            db.session.rollback()
+            return func(*args, **kwargs)
+        finally:
+            info[_DEPTH_KEY] = depth
+            if depth == 0:
+                info.pop(_USED_KEY, None)
+
+    return wrapper
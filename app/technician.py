@@ -1,70 +1,59 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from app.dao import repair_dao, reception_dao, component_dao
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, current_app, Response, stream_with_context
+from app.dao import repair_dao, reception_dao, component_dao, view_dao
+from app.dao.transaction import unit_of_work
+from app.dao.stock_dao import InsufficientStockError
 from app.models import ReceptionSlip, Car, RepairSlip
-from app import db
+from app import db, live_queue
 
 technician_bp = Blueprint('technician', __name__)
 
+QUEUE_FILTERS = ('quote', 'waiting', 'repairing', 'complete')
+
 
 def check_technician():
     role = session.get('role')
     return role in ['technician', 'admin']
 
 
-def get_technician_data(filter_status=None):
-    slips = []
-    user_id = session.get('user_id')
-
-    if not filter_status or filter_status in ['quote', 'waiting']:
-        results = db.session.query(ReceptionSlip, Car)\
-            .join(Car, ReceptionSlip.car_id == Car.id)\
-            .filter(ReceptionSlip.status.in_(['pending', 'waiting']))\
-            .order_by(ReceptionSlip.reception_date.asc())\
-            .all()
-        
-        for slip, car in results:
-            slips.append({
-                'id': slip.id,
-                'repair_id': None,
-                'status': slip.status,
-                'license_plate': car.license_plate,
-                'owner_name': car.owner_name,
-                'vehicle_type': car.vehicle_type,
-                'color': car.color,
-                'date_display': slip.reception_date,
-                'reception_date': slip.reception_date
-            })
-
-    if not filter_status or filter_status in ['repairing', 'complete']:
-        db_status = 'completed' if filter_status == 'complete' else filter_status
-        
-        query = db.session.query(RepairSlip, ReceptionSlip, Car)\
-            .join(ReceptionSlip, RepairSlip.reception_slip_id == ReceptionSlip.id)\
-            .join(Car, ReceptionSlip.car_id == Car.id)\
-            .filter(RepairSlip.technician_id == user_id)
-        
-        if db_status:
-            query = query.filter(ReceptionSlip.status == db_status)
-            
-        results = query.order_by(RepairSlip.start_date.desc()).all()
-        
-        for repair, slip, car in results:
-            slips.append({
-                'id': slip.id,
-                'repair_id': repair.id,
-                'status': slip.status,
-                'license_plate': car.license_plate,
-                'owner_name': car.owner_name,
-                'vehicle_type': car.vehicle_type,
-                'color': car.color,
-                'date_display': repair.start_date,
-                'reception_date': slip.reception_date
-            })
-
-    if not filter_status:
-        slips.sort(key=lambda x: x['date_display'] if x['date_display'] else x['reception_date'], reverse=True)
-        
-    return slips
+def _queue_filter(filter_status):
+    include_pending = not filter_status or filter_status in ['quote', 'waiting']
+    include_repairs = not filter_status or filter_status in ['repairing', 'complete']
+    repair_status = 'completed' if filter_status == 'complete' else filter_status
+
+    # Waiting lists are worked oldest first; everything else shows the newest activity first.
+    descending = filter_status not in ['quote', 'waiting']
+    return include_pending, include_repairs, repair_status, descending
+
+
+def _form_quantity():
+    """The posted quantity as a positive int, or None if it is missing, not a number or not positive."""
+    try:
+        quantity = int(request.form.get('quantity', 1))
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity > 0 else None
+
+
+def get_technician_data(filter_status=None, after=None, before=None):
+    include_pending, include_repairs, repair_status, descending = _queue_filter(filter_status)
+
+    return repair_dao.get_work_queue(
+        session.get('user_id'),
+        include_pending=include_pending,
+        include_repairs=include_repairs,
+        repair_status=repair_status if include_repairs else None,
+        after=after,
+        before=before,
+        descending=descending
+    )
+
+
+def get_sidebar_slips(filter_status=None):
+    filter_status = filter_status if filter_status in QUEUE_FILTERS else None
+    return repair_dao.get_cached_work_queue(
+        (session.get('user_id'), filter_status),
+        lambda: get_technician_data(filter_status).items
+    )
 
 
 @technician_bp.route('/')
@@ -73,9 +62,50 @@ def home():
         return redirect(url_for('main.login'))
     
     filter_status = request.args.get('filter')
-    slips = get_technician_data(filter_status)
+    live_seq = live_queue.current_seq()
+    page = get_technician_data(filter_status, request.args.get('after'), request.args.get('before'))
     
-    return render_template('technician/home.html', slips=slips, current_filter=filter_status)
+    return render_template('technician/home.html', slips=page.items, page=page, current_filter=filter_status,
+                           live_seq=live_seq)
+
+
+@technician_bp.route('/stream')
+def queue_stream():
+    if not check_technician():
+        # 204 tells EventSource to stop reconnecting.
+        return '', 204
+
+    filter_status = request.args.get('filter')
+    include_pending, include_repairs, repair_status, descending = _queue_filter(filter_status)
+    technician_id = session.get('user_id')
+
+    def in_view(status, row):
+        if include_pending and status in ['pending', 'waiting']:
+            return True
+        return include_repairs and row['technician_id'] == technician_id \
+            and (not repair_status or status == repair_status)
+
+    def render(change):
+        action = live_queue.queue_delta(change, in_view)
+        if action is None:
+            return None
+
+        html = None
+        if action != 'removed':
+            row = dict(change['row'])
+            in_repairs = row['repair_id'] and row['status'] not in ['pending', 'waiting']
+            row['date_display'] = row['start_date'] if in_repairs else row['reception_date']
+            html = render_template('technician/queue_row.html', slip=row, index='')
+        return {'action': action, 'slip_id': change['slip_id'],
+                'position': 'top' if descending else 'bottom', 'html': html}
+
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    since = int(since) if since and since.isdigit() else live_queue.current_seq()
+    stream = live_queue.event_stream(since, render, current_app.config.get('LIVE_QUEUE_STREAM_TIMEOUT', 300))
+    # The stream never touches the database: don't pin a pooled connection while it is open.
+    db.session.remove()
+    return Response(stream_with_context(stream), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @technician_bp.route('/start/<int:slip_id>', methods=['POST'])
@@ -83,12 +113,14 @@ def start_repair(slip_id):
     if not check_technician():
         return redirect(url_for('main.login'))
 
-    repair = repair_dao.create_repair_slip(slip_id, session['user_id'])
-
-    reception_dao.update_slip_status(slip_id, 'repairing')
+    with unit_of_work():
+        repair = repair_dao.create_repair_slip(slip_id, session['user_id'], commit=False)
+        reception_dao.update_slip_status(slip_id, 'repairing', commit=False)
+        repair_id = repair.id
+    repair_dao.invalidate_work_queue_cache()
     
     flash('Repair started. Please add items.')
-    return redirect(url_for('technician.add_item_view', repair_id=repair.id))
+    return redirect(url_for('technician.add_item_view', repair_id=repair_id))
 
 
 @technician_bp.route('/detail/<int:slip_id>')
@@ -97,47 +129,15 @@ def view_detail(slip_id):
         return redirect(url_for('main.login'))
     
     filter_status = request.args.get('filter')
-    slips = get_technician_data(filter_status)
+    slips = get_sidebar_slips(filter_status)
 
-    result = reception_dao.get_slip_by_id(slip_id)
-    if not result:
+    repair = view_dao.get_repair_view_by_slip(slip_id)
+    if not repair:
         flash('Slip not found.')
         return redirect(url_for('technician.home'))
     
-    slip, car = result
-
-    repair_slip = repair_dao.get_repair_by_reception_id(slip_id)
-    
-    repair = {
-        'repair_id': repair_slip.id if repair_slip else None,
-        'reception_id': slip.id,
-        'status': slip.status,
-        'description': slip.description,
-        'license_plate': car.license_plate,
-        'owner_name': car.owner_name,
-        'phone_number': car.phone_number,
-        'address': car.address,
-        'vehicle_type': car.vehicle_type,
-        'color': car.color
-    }
-    
-    items = []
-    if repair_slip:
-        details = repair_dao.get_repair_details(repair_slip.id)
-        for detail, component in details:
-            items.append({
-                'id': detail.id,
-                'repair_slip_id': detail.repair_slip_id,
-                'component_id': detail.component_id,
-                'quantity': detail.quantity,
-                'price_at_time': detail.price_at_time,
-                'category': detail.category,
-                'labor_fee': detail.labor_fee,
-                'name': component.name if component else None,
-                'price': component.current_price if component else None
-            })
-    
-    components = component_dao.get_all_active()
+    items = view_dao.get_item_views(repair.repair_id)
+    components = component_dao.get_component_options()
     
     return render_template('technician/home.html', slips=slips, current_filter=filter_status, modal='detail', repair=repair, items=items, components=components)
 
@@ -147,44 +147,15 @@ def add_item_view(repair_id):
     if not check_technician():
         return redirect(url_for('main.login'))
     
-    slips = get_technician_data()
+    slips = get_sidebar_slips()
     
-    result = repair_dao.get_repair_by_id(repair_id)
-    if not result:
+    repair = view_dao.get_repair_view(repair_id)
+    if not repair:
         flash('Repair not found.')
         return redirect(url_for('technician.home'))
     
-    repair_slip, slip, car = result
-    
-    repair = {
-        'repair_id': repair_slip.id,
-        'reception_id': slip.id,
-        'status': slip.status,
-        'description': slip.description,
-        'license_plate': car.license_plate,
-        'owner_name': car.owner_name,
-        'phone_number': car.phone_number,
-        'address': car.address,
-        'vehicle_type': car.vehicle_type,
-        'color': car.color
-    }
-    
-    details = repair_dao.get_repair_details(repair_id)
-    items = []
-    for detail, component in details:
-        items.append({
-            'id': detail.id,
-            'repair_slip_id': detail.repair_slip_id,
-            'component_id': detail.component_id,
-            'quantity': detail.quantity,
-            'price_at_time': detail.price_at_time,
-            'category': detail.category,
-            'labor_fee': detail.labor_fee,
-            'name': component.name if component else None,
-            'price': component.current_price if component else None
-        })
-    
-    components = component_dao.get_all_active()
+    items = view_dao.get_item_views(repair_id)
+    components = component_dao.get_component_options()
     
     return render_template('technician/home.html', slips=slips, modal='add_item', repair=repair, items=items, components=components)
 
@@ -194,48 +165,16 @@ def edit_item_view(repair_id, item_id):
     if not check_technician():
         return redirect(url_for('main.login'))
     
-    slips = get_technician_data()
+    slips = get_sidebar_slips()
     
-    result = repair_dao.get_repair_by_id(repair_id)
-    if not result:
+    repair = view_dao.get_repair_view(repair_id)
+    if not repair:
         flash('Repair not found.')
         return redirect(url_for('technician.home'))
     
-    repair_slip, slip, car = result
-    
-    repair = {
-        'repair_id': repair_slip.id,
-        'reception_id': slip.id,
-        'status': slip.status,
-        'description': slip.description,
-        'license_plate': car.license_plate,
-        'owner_name': car.owner_name,
-        'phone_number': car.phone_number,
-        'address': car.address,
-        'vehicle_type': car.vehicle_type,
-        'color': car.color
-    }
-    
-    details = repair_dao.get_repair_details(repair_id)
-    items = []
-    edit_item = None
-    for detail, component in details:
-        item_data = {
-            'id': detail.id,
-            'repair_slip_id': detail.repair_slip_id,
-            'component_id': detail.component_id,
-            'quantity': detail.quantity,
-            'price_at_time': detail.price_at_time,
-            'category': detail.category,
-            'labor_fee': detail.labor_fee,
-            'name': component.name if component else None,
-            'price': component.current_price if component else None
-        }
-        items.append(item_data)
-        if detail.id == item_id:
-            edit_item = item_data
-    
-    components = component_dao.get_all_active()
+    items = view_dao.get_item_views(repair_id)
+    edit_item = next((item for item in items if item.id == item_id), None)
+    components = component_dao.get_component_options()
     
     return render_template('technician/home.html', slips=slips, modal='add_item', repair=repair, items=items, components=components, edit_item=edit_item)
 
@@ -245,8 +184,12 @@ def add_item(repair_id):
     if not check_technician():
         return redirect(url_for('main.login'))
     
+    quantity = _form_quantity()
+    if quantity is None:
+        flash('Quantity must be a positive whole number.')
+        return redirect(url_for('technician.view_detail', slip_id=repair_id))
+
     component_id = request.form.get('component_id')
-    quantity = int(request.form.get('quantity', 1))
     category = request.form.get('category', '')
     current_price = request.form.get('current_price', 0)
     
@@ -263,8 +206,12 @@ def add_item(repair_id):
     else:
         component_id = None
 
-    repair_dao.add_repair_detail(repair_id, component_id, quantity, current_price, category, labor_fee)
-    flash('Item added.')
+    try:
+        with unit_of_work():
+            repair_dao.add_repair_detail(repair_id, component_id, quantity, current_price, category, labor_fee)
+        flash('Item added.')
+    except InsufficientStockError:
+        flash('Not enough stock for this component.')
     
     return redirect(url_for('technician.view_detail', slip_id=repair_id))
 
@@ -274,8 +221,15 @@ def update_item(item_id):
     if not check_technician():
         return redirect(url_for('main.login'))
     
+    quantity = _form_quantity()
+    if quantity is None:
+        flash('Quantity must be a positive whole number.')
+        detail = repair_dao.get_repair_detail_by_id(item_id)
+        if detail:
+            return redirect(url_for('technician.view_detail', slip_id=detail.repair_slip_id))
+        return redirect(url_for('technician.home'))
+
     component_id = request.form.get('component_id')
-    quantity = int(request.form.get('quantity', 1))
     category = request.form.get('category', '')
     current_price = request.form.get('current_price', 0)
     
@@ -296,8 +250,12 @@ def update_item(item_id):
     repair_id = detail.repair_slip_id if detail else None
     
     if repair_id:
-        repair_dao.update_repair_detail(item_id, component_id, quantity, current_price, category, labor_fee)
-        flash('Item updated.')
+        try:
+            with unit_of_work():
+                repair_dao.update_repair_detail(item_id, component_id, quantity, current_price, category, labor_fee)
+            flash('Item updated.')
+        except InsufficientStockError:
+            flash('Not enough stock for this component.')
         return redirect(url_for('technician.view_detail', slip_id=repair_id))
     
     return redirect(url_for('technician.home'))
@@ -308,7 +266,8 @@ def delete_item(item_id):
     if not check_technician():
         return redirect(url_for('main.login'))
     
-    repair_id = repair_dao.delete_repair_detail(item_id)
+    with unit_of_work():
+        repair_id = repair_dao.delete_repair_detail(item_id)
     
     if repair_id:
         flash('Item deleted.')
@@ -324,8 +283,10 @@ def finish_repair(repair_id):
     
     repair = repair_dao.get_repair_only_by_id(repair_id)
     if repair:
-        reception_dao.update_slip_status(repair.reception_slip_id, 'completed')
-        repair_dao.finish_repair(repair_id)
+        with unit_of_work():
+            reception_dao.update_slip_status(repair.reception_slip_id, 'completed', commit=False)
+            repair_dao.finish_repair(repair_id, commit=False)
+        repair_dao.invalidate_work_queue_cache()
     
     flash('Repair finished. Sent to Cashier.')
     return redirect(url_for('technician.home'))
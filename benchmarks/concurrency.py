@@ -0,0 +1,94 @@
+"""Measure throughput and connection pool behaviour under concurrent requests.
+
+    python -m benchmarks.concurrency --threads 16 --pool-size 5 --max-overflow 10
+
+Like benchmarks.run, the target database is dropped and regenerated.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+from benchmarks.run import DEFAULT_DB, VIEWS, login, percentile
+
+
+def worker(app, role, urls, requests_per_thread, barrier, latencies, errors):
+    client = app.test_client()
+    login(client, role)
+    barrier.wait()
+    for i in range(requests_per_thread):
+        url = urls[i % len(urls)]
+        started = time.perf_counter()
+        response = client.get(url)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            errors.append((url, response.status_code))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help='requests per thread')
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--db', default=os.getenv('DATABASE_URL') or DEFAULT_DB)
+    parser.add_argument('--pool-size', type=int)
+    parser.add_argument('--max-overflow', type=int)
+    parser.add_argument('--pool-timeout', type=int)
+    args = parser.parse_args(argv)
+
+    # Pool options are read from the environment when the engine is configured.
+    for name, value in (('DB_POOL_SIZE', args.pool_size),
+                        ('DB_MAX_OVERFLOW', args.max_overflow),
+                        ('DB_POOL_TIMEOUT', args.pool_timeout)):
+        if value is not None:
+            os.environ[name] = str(value)
+
+    from app import create_app, db, pool
+    from benchmarks import datagen
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.db})
+    app.logger.disabled = True
+
+    with app.app_context():
+        datagen.generate(scale=args.scale)
+        db.session.remove()
+        pool.reset_pool_stats()
+
+    urls_by_role = {}
+    for role, _, url in VIEWS:
+        urls_by_role.setdefault(role, []).append(url)
+    roles = list(urls_by_role)
+
+    latencies, errors = [], []
+    barrier = threading.Barrier(args.threads + 1)
+    threads = [
+        threading.Thread(target=worker, args=(
+            app, roles[i % len(roles)], urls_by_role[roles[i % len(roles)]],
+            args.requests, barrier, latencies, errors
+        ))
+        for i in range(args.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        stats = pool.get_pool_stats()
+
+    print(f'{len(latencies)} requests from {args.threads} threads in {elapsed:.2f}s '
+          f'({len(latencies) / elapsed:.1f} req/s)')
+    print(f'latency ms: p50={percentile(latencies, 50):.2f} p95={percentile(latencies, 95):.2f} '
+          f'p99={percentile(latencies, 99):.2f}')
+    print('pool: ' + ', '.join(f'{key}={value}' for key, value in stats.items()))
+    if errors:
+        print(f'{len(errors)} failed requests, first: {errors[0]}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app import db
+from app.dao import invoice_dao, settings_dao, user_dao
+from app.normalize import car_search_keys, name_tokens
+from app.models import (User, SystemSetting, Car, CarNameToken, ReceptionSlip, RepairSlip, RepairDetail,
+                        Component, Invoice)
+
+CARS_PER_SCALE = 500
+SLIPS_PER_CAR = 3
+COMPONENTS_PER_SCALE = 100
+INSERT_CHUNK_SIZE = 5000
+
+VEHICLE_TYPES = ['Sedan', 'SUV', 'Hatchback', 'Pickup', 'Van', None]
+CATEGORIES = ['Engine', 'Brake', 'Suspension', 'Electrical', 'Body', None]
+PAYMENT_METHODS = ['cash', 'card', 'transfer']
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ']
+MIDDLE_NAMES = ['Văn', 'Thị', 'Hữu', 'Đức', 'Minh', 'Ngọc', 'Thanh', 'Quốc']
+FIRST_NAMES = ['An', 'Bình', 'Cường', 'Dũng', 'Hà', 'Hải', 'Hùng', 'Lan', 'Linh', 'Long', 'Mai',
+               'Nam', 'Phong', 'Quân', 'Sơn', 'Tâm', 'Thảo', 'Trang', 'Tuấn', 'Vy']
+
+USERS = [
+    {'id': 1, 'username': 'admin', 'password': '123', 'role': 'admin', 'full_name': 'Administrator'},
+    {'id': 2, 'username': 'reception', 'password': '123', 'role': 'reception', 'full_name': 'Receptionist'},
+    {'id': 3, 'username': 'tech', 'password': '123', 'role': 'technician', 'full_name': 'Technician'},
+    {'id': 4, 'username': 'cashier', 'password': '123', 'role': 'cashier', 'full_name': 'Cashier'},
+]
+
+
+def _bulk_insert(model, rows):
+    for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+        db.session.execute(insert(model), rows[i:i + INSERT_CHUNK_SIZE])
+
+
+def fake_car(car_id):
+    plate = f'{random.randint(10, 99)}{random.choice("ABCDEFGH")}-{car_id:06d}'
+    owner = f'{random.choice(LAST_NAMES)} {random.choice(MIDDLE_NAMES)} {random.choice(FIRST_NAMES)}'
+    phone = f'09{random.randint(0, 99999999):08d}'
+    return {
+        'id': car_id,
+        'license_plate': plate,
+        'owner_name': owner,
+        'phone_number': phone,
+        'vehicle_type': random.choice(VEHICLE_TYPES),
+        # Core inserts skip the model validators, so fill the search keys here
+        **car_search_keys(plate, owner, phone),
+    }
+
+
+def car_name_tokens(cars):
+    """car_name_tokens rows for cars built by fake_car."""
+    return [{'car_id': car['id'], 'token': token} for car in cars for token in name_tokens(car['owner_key'])]
+
+
+def _slip_status(reception_date, now):
+    # Old work is settled; only the last couple of weeks still moves through the workflow.
+    if now - reception_date > timedelta(days=14):
+        return 'paid' if random.random() < 0.95 else 'completed'
+    return random.choice(['pending', 'waiting', 'repairing', 'completed', 'paid'])
+
+
+def generate(scale=1, years=3, seed=42):
+    """Recreate the schema and fill it with a synthetic dataset proportional to `scale`.
+
+    Returns a dict with the number of rows written per table.
+    """
+    rng_state = random.getstate()
+    random.seed(seed)
+
+    try:
+        db.drop_all()
+        db.create_all()
+        settings_dao.clear_cache()
+        for user in USERS:
+            user_dao.invalidate_user(user['id'])
+
+        now = datetime.now().replace(microsecond=0)
+        span = timedelta(days=365 * years)
+
+        _bulk_insert(User, USERS)
+        _bulk_insert(SystemSetting, [
+            {'setting_key': 'vat_rate', 'setting_value': '10'},
+            {'setting_key': 'max_cars_per_day', 'setting_value': '30'},
+        ])
+
+        components = [{
+            'id': i,
+            'name': f'Component {i:05d}',
+            'current_price': round(random.uniform(50, 5000), 2),
+            'stock_quantity': random.randint(0, 200),
+            'is_deleted': random.random() < 0.02,
+        } for i in range(1, COMPONENTS_PER_SCALE * scale + 1)]
+        _bulk_insert(Component, components)
+
+        cars = [fake_car(i) for i in range(1, CARS_PER_SCALE * scale + 1)]
+        _bulk_insert(Car, cars)
+        _bulk_insert(CarNameToken, car_name_tokens(cars))
+
+        slips, repairs, details, invoices = [], [], [], []
+        for slip_id in range(1, len(cars) * SLIPS_PER_CAR + 1):
+            reception_date = now - timedelta(seconds=random.randint(0, int(span.total_seconds())))
+            status = _slip_status(reception_date, now)
+            slips.append({
+                'id': slip_id,
+                'car_id': random.randint(1, len(cars)),
+                'reception_date': reception_date,
+                'status': status,
+                'description': 'Synthetic benchmark slip',
+            })
+            if status in ('pending', 'waiting'):
+                continue
+
+            repair_id = len(repairs) + 1
+            start_date = reception_date + timedelta(hours=random.randint(1, 24))
+            end_date = None if status == 'repairing' else start_date + timedelta(hours=random.randint(1, 72))
+            repairs.append({
+                'id': repair_id,
+                'reception_slip_id': slip_id,
+                'technician_id': 3,
+                'start_date': start_date,
+                'end_date': end_date,
+            })
+
+            subtotal = 0
+            for _ in range(random.randint(1, 5)):
+                component = random.choice(components)
+                quantity = random.randint(1, 4)
+                labor_fee = random.choice([0, 100, 200, 500])
+                details.append({
+                    'id': len(details) + 1,
+                    'repair_slip_id': repair_id,
+                    'component_id': component['id'],
+                    'quantity': quantity,
+                    'price_at_time': component['current_price'],
+                    'category': random.choice(CATEGORIES),
+                    'labor_fee': labor_fee,
+                })
+                subtotal += component['current_price'] * quantity + labor_fee
+
+            if status == 'paid':
+                invoices.append({
+                    'id': len(invoices) + 1,
+                    'repair_slip_id': repair_id,
+                    'cashier_id': 4,
+                    'total_amount': round(subtotal * 1.1, 2),
+                    'vat_rate': 10.0,
+                    'created_at': end_date + timedelta(hours=random.randint(1, 48)),
+                    'payment_method': random.choice(PAYMENT_METHODS),
+                })
+
+        _bulk_insert(ReceptionSlip, slips)
+        _bulk_insert(RepairSlip, repairs)
+        _bulk_insert(RepairDetail, details)
+        _bulk_insert(Invoice, invoices)
+        db.session.commit()
+
+        invoice_dao.rebuild_daily_revenue()
+    finally:
+        random.setstate(rng_state)
+
+    return {
+        'components': len(components),
+        'cars': len(cars),
+        'reception_slips': len(slips),
+        'repair_slips': len(repairs),
+        'repair_details': len(details),
+        'invoices': len(invoices),
+    }
@@ -0,0 +1,153 @@
+"""Time the hot views against synthetic datasets and compare with a stored baseline.
+
+    python -m benchmarks.run --scale 1 --scale 10 --save-baseline
+    python -m benchmarks.run --scale 1 --scale 10
+
+The database is dropped and regenerated for every scale, so point DATABASE_URL
+(or --db) at a throwaway database, never at real data.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+DEFAULT_DB = 'sqlite:///benchmark.sqlite'
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+VIEWS = [
+    ('admin', 'admin.dashboard', '/admin/dashboard'),
+    ('admin', 'admin.accessories', '/admin/accessories'),
+    ('admin', 'admin.low_stock_alert', '/admin/low-stock-alert'),
+    ('cashier', 'cashier.home', '/cashier/'),
+    ('tech', 'technician.home', '/technician/'),
+    ('reception', 'reception.home', '/reception/'),
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = (len(ordered) - 1) * pct / 100
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+def login(client, username):
+    client.get('/logout')
+    response = client.post('/login', data={'username': username, 'password': '123'})
+    if response.status_code != 302:
+        raise RuntimeError(f'Login failed for {username}: {response.status_code}')
+
+
+def time_view(client, url, repeat, warmup):
+    for _ in range(warmup):
+        client.get(url)
+
+    samples, queries = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+        queries.append(int(response.headers.get('X-DB-Query-Count', 0)))
+
+    return {
+        'p50': round(percentile(samples, 50), 2),
+        'p95': round(percentile(samples, 95), 2),
+        'p99': round(percentile(samples, 99), 2),
+        'mean': round(statistics.mean(samples), 2),
+        'max': round(max(samples), 2),
+        'queries': max(queries),
+    }
+
+
+def run_scale(app, scale, years, repeat, warmup):
+    from app import db
+    from app.dao import repair_dao
+    from benchmarks import datagen
+
+    with app.app_context():
+        started = time.perf_counter()
+        rows = datagen.generate(scale=scale, years=years)
+        db.session.remove()
+    repair_dao.invalidate_work_queue_cache()
+    print(f"\nscale {scale}: generated in {time.perf_counter() - started:.1f}s "
+          + ', '.join(f'{table}={count}' for table, count in rows.items()))
+
+    client = app.test_client()
+    results, current_role = {}, None
+    for role, name, url in VIEWS:
+        if role != current_role:
+            login(client, role)
+            current_role = role
+        results[name] = time_view(client, url, repeat, warmup)
+    return {'rows': rows, 'views': results}
+
+
+def print_report(scale, result, baseline, tolerance):
+    print(f"{'view':<24}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'queries':>9}  vs baseline")
+    regressions = []
+    base_views = (baseline or {}).get(str(scale), {}).get('views', {})
+    for name, stats in result['views'].items():
+        note = ''
+        base = base_views.get(name)
+        if base:
+            change = (stats['p95'] - base['p95']) / base['p95'] if base['p95'] else 0
+            note = f"p95 {change:+.0%}"
+            if stats['queries'] != base['queries']:
+                note += f", queries {base['queries']} -> {stats['queries']}"
+            # Ignore sub-millisecond jitter on the fast views.
+            if (change > tolerance and stats['p95'] - base['p95'] > 1) or stats['queries'] > base['queries']:
+                note += '  REGRESSION'
+                regressions.append((scale, name))
+        print(f"{name:<24}{stats['p50']:>9.2f}{stats['p95']:>9.2f}{stats['p99']:>9.2f}"
+              f"{stats['max']:>9.2f}{stats['queries']:>9}  {note}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, action='append',
+                        help='dataset scale factor, repeatable (default: 1)')
+    parser.add_argument('--years', type=int, default=3, help='span of generated history')
+    parser.add_argument('--repeat', type=int, default=50, help='timed requests per view')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests per view')
+    parser.add_argument('--db', default=os.getenv('DATABASE_URL') or DEFAULT_DB)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown before flagging a regression')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.db, 'PERF_HEADERS': True})
+    app.logger.disabled = True
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, regressions = {}, []
+    for scale in args.scale or [1]:
+        results[str(scale)] = run_scale(app, scale, args.years, args.repeat, args.warmup)
+        regressions += print_report(scale, results[str(scale)], baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nBaseline saved to {args.baseline}')
+    elif baseline is None:
+        print(f'\nNo baseline at {args.baseline}; run with --save-baseline to create one')
+    elif regressions:
+        print(f'\n{len(regressions)} regression(s) against {args.baseline}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Time the car search against a large synthetic fleet, indexed keys vs. a plain LIKE scan.
+
+    python -m benchmarks.search --cars 500000
+
+Like benchmarks.run, the target database is dropped and regenerated.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from benchmarks.run import DEFAULT_DB, percentile
+
+# name -> builds a query string from a random existing car
+QUERIES = [
+    ('exact plate', lambda car: car['license_plate'].lower().replace('-', ' ')),
+    ('plate prefix', lambda car: car['license_plate'][:4]),
+    ('plate serial', lambda car: car['plate_number']),
+    ('phone prefix', lambda car: car['phone_number'][:6]),
+    ('owner name', lambda car: car['owner_key']),
+    ('owner surname', lambda car: car['owner_name'].split()[0]),
+    ('owner given name', lambda car: car['owner_name'].split()[-1]),
+    ('owner last words', lambda car: ' '.join(car['owner_key'].split()[1:])),
+]
+
+
+def naive_search(q, limit):
+    from sqlalchemy import or_
+    from app import db
+    from app.models import Car
+
+    pattern = f'%{q}%'
+    return db.session.query(Car.id).filter(or_(
+        Car.license_plate.like(pattern), Car.owner_name.like(pattern), Car.phone_number.like(pattern)
+    )).limit(limit).all()
+
+
+def time_queries(search, queries, limit):
+    latencies, hits = [], 0
+    for q in queries:
+        started = time.perf_counter()
+        hits += len(search(q, limit))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, hits / len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cars', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=200, help='queries per kind')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--db', default=os.getenv('DATABASE_URL') or DEFAULT_DB)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import insert
+    from app import create_app, db
+    from app.dao import car_dao
+    from app.models import Car, CarNameToken
+    from benchmarks import datagen
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.db})
+    random.seed(args.seed)
+
+    with app.app_context():
+        started = time.perf_counter()
+        db.drop_all()
+        db.create_all()
+        cars = []
+        for car_id in range(1, args.cars + 1):
+            cars.append(datagen.fake_car(car_id))
+            if len(cars) == datagen.INSERT_CHUNK_SIZE or car_id == args.cars:
+                db.session.execute(insert(Car), cars)
+                db.session.execute(insert(CarNameToken), datagen.car_name_tokens(cars))
+                sample = cars
+                cars = []
+        db.session.commit()
+        print(f'{args.cars} cars generated in {time.perf_counter() - started:.1f}s')
+
+        # Queries are drawn from the last chunk so the exact-match ones always have an answer.
+        print(f"{'query':<18}{'indexed p50':>13}{'p95':>9}{'hits':>7}{'scan p50':>11}{'p95':>9}{'hits':>7}"
+              '   (ms)')
+        for name, build in QUERIES:
+            queries = [build(random.choice(sample)) for _ in range(args.repeat)]
+            indexed, indexed_hits = time_queries(car_dao.search_cars, queries, args.limit)
+            scan, scan_hits = time_queries(naive_search, queries[:max(args.repeat // 10, 1)], args.limit)
+            print(f'{name:<18}{percentile(indexed, 50):>13.2f}{percentile(indexed, 95):>9.2f}'
+                  f'{indexed_hits:>7.1f}{percentile(scan, 50):>11.2f}{percentile(scan, 95):>9.2f}'
+                  f'{scan_hits:>7.1f}')
+            db.session.remove()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Measure process startup cost for each blueprint profile.
+
+    python -m benchmarks.startup --runs 10
+
+Every run is a fresh interpreter, so module imports are paid each time just
+like a new Gunicorn worker or CLI invocation.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'BLUEPRINTS': sys.argv[1]})
+created = time.perf_counter()
+application.test_client().get('/login')
+first_request = time.perf_counter()
+print(json.dumps({
+    'import': (imported - started) * 1000,
+    'create_app': (created - imported) * 1000,
+    'first_request': (first_request - created) * 1000,
+    'total': (first_request - started) * 1000,
+    'modules': len(sys.modules),
+}))
+"""
+
+
+def measure(profile, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE, profile],
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--profile', action='append',
+                        help='blueprint profile or list, repeatable (default: all, reporting, front_desk, main)')
+    args = parser.parse_args(argv)
+
+    print(f"{'profile':<14}{'import':>10}{'create_app':>12}{'1st request':>13}{'total':>10}{'modules':>9}"
+          "   (median ms)")
+    for profile in args.profile or ['all', 'reporting', 'front_desk', 'main']:
+        result = measure(profile, args.runs)
+        print(f"{profile:<14}{result['import']:>10.1f}{result['create_app']:>12.1f}"
+              f"{result['first_request']:>13.1f}{result['total']:>10.1f}{result['modules']:>9.0f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
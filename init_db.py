@@ -1,6 +1,8 @@
-from app import app, db
+from app import create_app, db
 from app.models import User, SystemSetting
 
+app = create_app()
+
 with app.app_context():
     db.create_all()
 
@@ -0,0 +1,11 @@
+from app import create_app, db
+from app.dao import invoice_dao
+
+app = create_app()
+
+with app.app_context():
+    db.create_all()
+
+    days = invoice_dao.rebuild_daily_revenue()
+
+    print(f" Daily revenue rebuilt ({days} days)")
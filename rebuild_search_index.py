@@ -0,0 +1,25 @@
+from sqlalchemy import inspect, text
+from app import create_app, db
+from app.dao import car_dao
+from app.models import Car
+
+SEARCH_COLUMNS = ('plate_key', 'plate_number', 'phone_key', 'owner_key')
+
+app = create_app()
+
+with app.app_context():
+    db.create_all()
+
+    # create_all does not alter existing tables: add the search columns to databases created before them
+    existing = {column['name'] for column in inspect(db.engine).get_columns(Car.__tablename__)}
+    for name in SEARCH_COLUMNS:
+        if name not in existing:
+            column_type = Car.__table__.c[name].type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {Car.__tablename__} ADD COLUMN {name} {column_type}'))
+    db.session.commit()
+    for index in Car.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+    cars = car_dao.rebuild_search_keys()
+
+    print(f" Search keys and name tokens rebuilt ({cars} cars)")
@@ -0,0 +1,45 @@
+import pytest
+from app import create_app, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    # A file database so that every thread gets its own connection, as under a real server.
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.sqlite'}",
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def run_concurrently(app, count, target):
+    """Start `count` threads that each call `target(i)` inside their own app context, all at once.
+
+    Returns the results in thread order; an exception raised by `target` is returned as its result.
+    """
+    import threading
+
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        with app.app_context():
+            barrier.wait()
+            try:
+                results[i] = target(i)
+            except Exception as error:
+                results[i] = error
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
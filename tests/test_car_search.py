@@ -0,0 +1,44 @@
+from app import db
+from app.dao import car_dao
+from app.models import CarNameToken
+
+
+def _tokens(car_id):
+    return sorted(row.token for row in CarNameToken.query.filter_by(car_id=car_id))
+
+
+def test_name_tokens_follow_the_owner_name(app):
+    with app.app_context():
+        car = car_dao.create_car('51A-123.45', 'Trần Đức Anh', '0903123456')
+        assert _tokens(car.id) == ['anh', 'duc']
+
+        car_dao.update_car(car.id, owner_name='Lê Thị Mai')
+        assert _tokens(car.id) == ['mai', 'thi']
+
+        car_dao.update_car(car.id, owner_name='Lê  Thị Mai')
+        assert _tokens(car.id) == ['mai', 'thi']
+
+
+def test_owner_word_search_uses_the_tokens(app):
+    with app.app_context():
+        car_dao.create_car('51A-123.45', 'Trần Đức Anh', '0903123456')
+        car_dao.create_car('30B-678.90', 'Đức Văn Bình', '0912000111')
+        car_dao.create_car('29C-111.22', 'Phạm Minh Hải', '0988777666')
+
+        found = car_dao.search_cars('duc')
+        assert [car['owner_name'] for car in found] == ['Đức Văn Bình', 'Trần Đức Anh']
+        assert [car['rank'] for car in found] == [4, 5]
+
+        assert [car['license_plate'] for car in car_dao.search_cars('đức a')] == ['51A-123.45']
+        assert [car['license_plate'] for car in car_dao.search_cars('hai')] == ['29C-111.22']
+        assert car_dao.search_cars('anh duc') == []
+
+
+def test_rebuild_backfills_the_tokens(app):
+    with app.app_context():
+        car = car_dao.create_car('51A-123.45', 'Trần Đức Anh', '0903123456')
+        CarNameToken.query.delete()
+        db.session.commit()
+
+        assert car_dao.rebuild_search_keys() == 1
+        assert _tokens(car.id) == ['anh', 'duc']
@@ -0,0 +1,73 @@
+from datetime import datetime
+from app import db
+from app.dao import reception_dao
+from app.dao.transaction import unit_of_work
+from app.models import Car, DailyReceptionCount, ReceptionSlip
+from app.perf import query_budget
+from conftest import run_concurrently
+
+LIMIT = 10
+THREADS = 30
+
+
+def test_daily_limit_holds_under_concurrent_receptions(app):
+    with app.app_context():
+        car = Car(license_plate='51A-123.45', owner_name='Test Owner')
+        db.session.add(car)
+        db.session.commit()
+        car_id = car.id
+
+    def receive(i):
+        received_at = datetime.now()
+        with unit_of_work():
+            if not reception_dao.reserve_daily_slot(LIMIT, received_at.date()):
+                return False
+            reception_dao.create_slip(car_id, reception_date=received_at, commit=False)
+        return True
+
+    results = run_concurrently(app, THREADS, receive)
+
+    assert all(isinstance(r, bool) for r in results), results
+    assert results.count(True) == LIMIT
+    with app.app_context():
+        today = datetime.now().date()
+        assert reception_dao.count_day_slips(today) == LIMIT
+        assert db.session.get(DailyReceptionCount, today).slip_count == LIMIT
+
+
+def test_slot_and_slip_use_the_same_day(app):
+    with app.app_context():
+        car = Car(license_plate='51A-123.45', owner_name='Test Owner')
+        db.session.add(car)
+        db.session.commit()
+
+        # Received one second before midnight: both the counter and the slip belong to that day.
+        received_at = datetime(2025, 3, 1, 23, 59, 59)
+        with unit_of_work():
+            assert reception_dao.reserve_daily_slot(LIMIT, received_at.date())
+            reception_dao.create_slip(car.id, reception_date=received_at, commit=False)
+
+        assert reception_dao.get_daily_count(received_at.date()) == 1
+        assert reception_dao.count_day_slips(received_at.date()) == 1
+        assert ReceptionSlip.query.one().reception_date == received_at
+
+
+def test_reservation_is_one_statement_once_the_day_has_a_counter(app):
+    day = datetime(2025, 3, 1).date()
+    with app.app_context():
+        car = Car(license_plate='51A-123.45', owner_name='Test Owner')
+        db.session.add(car)
+        db.session.add(ReceptionSlip(car=car, reception_date=datetime(2025, 3, 1, 9, 0)))
+        db.session.commit()
+
+        # The first reception of the day seeds the counter from the slips already recorded.
+        assert reception_dao.reserve_daily_slot(LIMIT, day)
+        assert reception_dao.get_daily_count(day) == 2
+
+        with query_budget(1):
+            assert reception_dao.reserve_daily_slot(LIMIT, day)
+        assert reception_dao.get_daily_count(day) == 3
+
+        db.session.get(DailyReceptionCount, day).slip_count = LIMIT
+        db.session.commit()
+        assert not reception_dao.reserve_daily_slot(LIMIT, day)
@@ -0,0 +1,24 @@
+from datetime import date
+from app import db
+from app.dao import invoice_dao
+from app.dao.transaction import unit_of_work
+from app.models import DailyRevenue, Invoice
+from conftest import run_concurrently
+
+THREADS = 20
+
+
+def test_concurrent_first_payments_of_the_day(app):
+    def pay(i):
+        with unit_of_work():
+            invoice_dao.create_invoice(i + 1, None, 100.0, 10.0, commit=False)
+        return True
+
+    results = run_concurrently(app, THREADS, pay)
+
+    assert results == [True] * THREADS
+    with app.app_context():
+        assert Invoice.query.count() == THREADS
+        rollup = db.session.get(DailyRevenue, date.today())
+        assert rollup.invoice_count == THREADS
+        assert rollup.total_amount == 100.0 * THREADS
@@ -0,0 +1,40 @@
+import pytest
+from app import db, low_stock
+from app.dao import settings_dao
+from app.models import Component, SystemSetting, User
+
+
+@pytest.fixture
+def admin_client(app):
+    settings_dao.clear_cache()
+    with app.app_context():
+        db.session.add(User(id=1, username='admin', password='123', role='admin', full_name='Admin'))
+        for i, stock in enumerate((0, 10, 20, 30, 40), start=1):
+            db.session.add(Component(id=i, name=f'Part {i}', current_price=100, stock_quantity=stock))
+        settings_dao.set_setting('low_stock_threshold', 10)
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': '123'})
+    yield client
+    settings_dao.clear_cache()
+
+
+def test_threshold_change_refreshes_the_count(app, admin_client):
+    assert admin_client.get('/admin/low-stock-count').get_json() == {'count': 2}
+
+    admin_client.post('/admin/update-stock-threshold', data={'threshold': 40})
+
+    assert admin_client.get('/admin/low-stock-count').get_json() == {'count': 5}
+
+
+def test_count_changes_do_not_bump_the_settings_version(app, admin_client):
+    with app.app_context():
+        assert low_stock.refresh_low_stock_count() == 2
+        version = db.session.get(SystemSetting, settings_dao.VERSION_KEY).setting_value
+
+        Component.query.filter_by(id=3).update({'stock_quantity': 5})
+        db.session.commit()
+        assert low_stock.refresh_low_stock_count() == 3
+
+        assert settings_dao.get_live_setting(low_stock.COUNT_KEY) == '3'
+        db.session.expire_all()
+        assert db.session.get(SystemSetting, settings_dao.VERSION_KEY).setting_value == version
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from app import db
+from app.dao import repair_dao
+from app.models import Car, ReceptionSlip, RepairDetail, RepairSlip, User
+
+REPAIRS = 7
+
+
+def _seed_repairs(app, missing_start=()):
+    """Completed repairs sharing timestamps, some without an end_date, as legacy data has."""
+    started = datetime(2026, 1, 1, 8, 0)
+    with app.app_context():
+        db.session.add(User(id=1, username='tech', password='x', role='technician'))
+        for i in range(1, REPAIRS + 1):
+            db.session.add(Car(id=i, license_plate=f'51A-{i:05d}', owner_name='Owner'))
+            db.session.add(ReceptionSlip(id=i, car_id=i, status='completed', reception_date=started))
+            db.session.add(RepairSlip(
+                id=i, reception_slip_id=i, technician_id=1,
+                start_date=None if i in missing_start else started + timedelta(minutes=i % 2),
+                end_date=None if i % 3 == 0 else started + timedelta(hours=i % 2)
+            ))
+            # Repair i has i - 1 parts at 10 each plus 5 labor per part.
+            for _ in range(i - 1):
+                db.session.add(RepairDetail(repair_slip_id=i, quantity=1, price_at_time=10, labor_fee=5))
+        db.session.commit()
+
+
+def _walk(load, per_page=2):
+    """Ids of every page, following next cursors and then back with prev cursors."""
+    pages = [load(after=None, before=None, per_page=per_page)]
+    while pages[-1].has_next:
+        pages.append(load(after=pages[-1].next_cursor, before=None, per_page=per_page))
+    backward = [pages[-1]]
+    while backward[-1].has_prev:
+        backward.append(load(after=None, before=backward[-1].prev_cursor, per_page=per_page))
+    return pages, backward[::-1]
+
+
+def test_cashier_queue_pages_over_tied_start_dates(app):
+    _seed_repairs(app)
+    with app.app_context():
+        forward, backward = _walk(lambda **kw: repair_dao.get_completed_repairs(**kw))
+
+        ids = [row[2].id for page in forward for row in page]
+        assert sorted(ids) == list(range(1, REPAIRS + 1))
+        assert [row[2].id for page in backward for row in page] == ids
+        assert all(row.subtotal == 15 * (row[2].id - 1) for page in forward for row in page)
+
+
+def test_queue_rows_subtotals(app):
+    _seed_repairs(app)
+    with app.app_context():
+        rows = repair_dao.get_queue_rows([2, 5])
+
+        assert sorted((row.id, row.total_amount) for row in rows) == [(2, 15), (5, 60)]
+
+
+def test_work_queue_pages_over_missing_start_dates(app):
+    _seed_repairs(app, missing_start=(4,))
+    with app.app_context():
+        forward, backward = _walk(
+            lambda **kw: repair_dao.get_work_queue(1, include_pending=False, **kw))
+
+        ids = [row.repair_id for page in forward for row in page]
+        assert sorted(ids) == list(range(1, REPAIRS + 1))
+        assert [row.repair_id for page in backward for row in page] == ids
+        assert all(row.date_display is not None for page in forward for row in page)
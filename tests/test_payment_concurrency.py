@@ -0,0 +1,58 @@
+from datetime import date
+import pytest
+from app import db
+from app.models import Car, DailyRevenue, Invoice, ReceptionSlip, RepairDetail, RepairSlip, User
+from conftest import run_concurrently
+
+THREADS = 8
+
+
+@pytest.fixture
+def repair_id(app):
+    with app.app_context():
+        db.session.add(User(id=1, username='cashier', password='123', role='cashier', full_name='Cashier'))
+        car = Car(license_plate='51A-123.45', owner_name='Test Owner')
+        db.session.add(car)
+        db.session.flush()
+        slip = ReceptionSlip(car_id=car.id, status='completed')
+        db.session.add(slip)
+        db.session.flush()
+        repair = RepairSlip(reception_slip_id=slip.id, technician_id=1)
+        db.session.add(repair)
+        db.session.flush()
+        db.session.add(RepairDetail(repair_slip_id=repair.id, quantity=2, price_at_time=100, labor_fee=50))
+        db.session.commit()
+        return repair.id
+
+
+def _cashier_client(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'cashier', 'password': '123'})
+    return client
+
+
+def test_concurrent_payments_create_one_invoice(app, repair_id):
+    clients = [_cashier_client(app) for _ in range(THREADS)]
+
+    results = run_concurrently(app, THREADS, lambda i: clients[i].post(f'/cashier/pay/{repair_id}').status_code)
+
+    assert results == [302] * THREADS
+    with app.app_context():
+        invoice = Invoice.query.filter_by(repair_slip_id=repair_id).one()
+        assert invoice.total_amount == pytest.approx(275.0)
+        rollup = db.session.get(DailyRevenue, date.today())
+        assert rollup.invoice_count == 1
+        assert rollup.total_amount == pytest.approx(275.0)
+
+
+def test_payment_requires_a_completed_repair(app, repair_id):
+    with app.app_context():
+        slip = ReceptionSlip.query.one()
+        slip.status = 'repairing'
+        db.session.commit()
+
+    response = _cashier_client(app).post(f'/cashier/pay/{repair_id}', follow_redirects=True)
+
+    assert b'Only completed repairs can be paid.' in response.data
+    with app.app_context():
+        assert Invoice.query.count() == 0
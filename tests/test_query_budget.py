@@ -0,0 +1,88 @@
+import threading
+import pytest
+from app import create_app, db
+from app.models import Car, ReceptionSlip
+from app.perf import QueryBudgetExceeded, query_budget
+from benchmarks import datagen
+from benchmarks.run import login
+
+# Statements per warm request (settings and the session user are cached); a view that
+# starts loading rows one by one blows through these immediately.
+VIEW_BUDGETS = [
+    ('admin', '/admin/dashboard', 4),
+    ('admin', '/admin/accessories', 3),
+    ('admin', '/admin/low-stock-alert', 2),
+    ('cashier', '/cashier/', 2),
+    ('tech', '/technician/', 1),
+    ('reception', '/reception/', 3),
+    ('reception', '/reception/search?q=51', 3),
+    ('reception', '/reception/cars/1/history', 4),
+    ('reception', '/reception/cars/1/history.json', 4),
+]
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path_factory.mktemp('perf') / 'test.sqlite'}",
+        'TESTING': True,
+    })
+    with app.app_context():
+        datagen.generate(scale=1)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _client(app, role):
+    client = app.test_client()
+    login(client, role)
+    return client
+
+
+@pytest.mark.parametrize('role, url, budget', VIEW_BUDGETS)
+def test_view_stays_within_query_budget(app, role, url, budget):
+    client = _client(app, role)
+    assert client.get(url).status_code == 200
+
+    with query_budget(budget):
+        assert client.get(url).status_code == 200
+
+
+def test_history_page_cost_does_not_grow_with_visits(app):
+    client = _client(app, 'reception')
+    with app.app_context():
+        db.session.add_all([ReceptionSlip(car_id=1, status='pending') for _ in range(30)])
+        db.session.commit()
+
+    with query_budget(4):
+        client.get('/reception/cars/1/history.json')
+
+
+def test_budget_reports_repeated_statements(app):
+    with app.app_context():
+        with pytest.raises(QueryBudgetExceeded, match='5x SELECT'):
+            with query_budget(3):
+                for car_id in range(1, 6):
+                    db.session.get(Car, car_id)
+
+
+def test_budget_ignores_other_threads(app):
+    def other_thread():
+        with app.app_context():
+            for car_id in range(1, 11):
+                db.session.get(Car, car_id)
+            db.session.remove()
+
+    with query_budget(0) as stats:
+        thread = threading.Thread(target=other_thread)
+        thread.start()
+        thread.join()
+    assert stats.query_count == 0
+
+
+def test_perf_headers_only_for_admins(app):
+    assert 'X-DB-Query-Count' not in app.test_client().get('/login').headers
+    assert 'X-DB-Query-Count' not in _client(app, 'cashier').get('/cashier/').headers
+    assert 'X-DB-Query-Count' in _client(app, 'admin').get('/admin/dashboard').headers
@@ -0,0 +1,33 @@
+from app.dao import settings_dao
+from app.models import SystemSetting
+from conftest import run_concurrently
+
+THREADS = 20
+
+
+def test_concurrent_first_writes(app):
+    # No settings_version row yet: every writer has to create it or bump it.
+    def write(i):
+        settings_dao.set_setting(f'key_{i % 4}', i)
+        return True
+
+    results = run_concurrently(app, THREADS, write)
+
+    assert results == [True] * THREADS
+    with app.app_context():
+        rows = {s.setting_key: s.setting_value for s in SystemSetting.query.all()}
+        assert sorted(rows) == ['key_0', 'key_1', 'key_2', 'key_3', settings_dao.VERSION_KEY]
+        assert rows[settings_dao.VERSION_KEY]
+
+
+def test_set_setting_overwrites_and_bumps_the_version(app):
+    with app.app_context():
+        settings_dao.set_setting('vat_rate', 10)
+        version = SystemSetting.query.get(settings_dao.VERSION_KEY).setting_value
+
+        setting = settings_dao.set_setting('vat_rate', 8)
+
+        assert setting.setting_value == '8'
+        assert settings_dao.get_setting('vat_rate') == '8'
+        assert SystemSetting.query.get(settings_dao.VERSION_KEY).setting_value != version
+        assert settings_dao.get_all_settings() == {'vat_rate': '8'}
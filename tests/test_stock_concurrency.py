@@ -0,0 +1,118 @@
+import pytest
+from app import db
+from app.dao import repair_dao, stock_dao
+from app.dao.stock_dao import InsufficientStockError
+from app.dao.transaction import unit_of_work
+from app.models import Car, Component, ReceptionSlip, RepairDetail, RepairSlip
+from conftest import run_concurrently
+
+STOCK = 50
+QUANTITY = 3
+THREADS = 24
+
+
+@pytest.fixture
+def component_id(app):
+    with app.app_context():
+        component = Component(name='Brake pad', current_price=100, stock_quantity=STOCK)
+        db.session.add(component)
+        db.session.commit()
+        return component.id
+
+
+@pytest.fixture
+def repair_id(app):
+    with app.app_context():
+        car = Car(license_plate='51A-123.45', owner_name='Test Owner')
+        db.session.add(car)
+        db.session.flush()
+        slip = ReceptionSlip(car_id=car.id, status='repairing')
+        db.session.add(slip)
+        db.session.flush()
+        repair = RepairSlip(reception_slip_id=slip.id)
+        db.session.add(repair)
+        db.session.commit()
+        return repair.id
+
+
+def _stock(component_id):
+    db.session.expire_all()
+    return db.session.get(Component, component_id).stock_quantity
+
+
+def test_concurrent_reservations_never_oversell(app, component_id):
+    def reserve(i):
+        with unit_of_work():
+            stock_dao.reserve(component_id, QUANTITY)
+        return True
+
+    results = run_concurrently(app, THREADS, reserve)
+
+    succeeded = [r for r in results if r is True]
+    refused = [r for r in results if isinstance(r, InsufficientStockError)]
+    assert len(succeeded) + len(refused) == THREADS, results
+    assert len(succeeded) == STOCK // QUANTITY
+    with app.app_context():
+        assert _stock(component_id) == STOCK - len(succeeded) * QUANTITY >= 0
+
+
+def test_concurrent_repair_items_never_oversell(app, component_id, repair_id):
+    def add_item(i):
+        with unit_of_work():
+            repair_dao.add_repair_detail(repair_id, component_id, QUANTITY, 100, commit=False)
+        return True
+
+    results = run_concurrently(app, THREADS, add_item)
+
+    succeeded = results.count(True)
+    assert succeeded == STOCK // QUANTITY
+    with app.app_context():
+        assert RepairDetail.query.filter_by(repair_slip_id=repair_id).count() == succeeded
+        assert _stock(component_id) == STOCK - succeeded * QUANTITY
+
+
+@pytest.mark.parametrize('quantity', [0, -5])
+def test_non_positive_quantity_is_rejected(app, component_id, repair_id, quantity):
+    with app.app_context():
+        with pytest.raises(ValueError):
+            repair_dao.add_repair_detail(repair_id, component_id, quantity, 100)
+
+        detail = repair_dao.add_repair_detail(repair_id, component_id, 2, 100)
+        with pytest.raises(ValueError):
+            repair_dao.update_repair_detail(detail.id, quantity=quantity)
+        db.session.rollback()
+        assert _stock(component_id) == STOCK - 2
+
+
+def test_edit_and_delete_keep_stock_balanced(app, component_id, repair_id):
+    with app.app_context():
+        detail = repair_dao.add_repair_detail(repair_id, component_id, 5, 100)
+        repair_dao.update_repair_detail(detail.id, quantity=8)
+        assert _stock(component_id) == STOCK - 8
+        repair_dao.update_repair_detail(detail.id, quantity=2)
+        assert _stock(component_id) == STOCK - 2
+        repair_dao.delete_repair_detail(detail.id)
+        assert _stock(component_id) == STOCK
+
+
+def test_unreserved_detail_does_not_release_stock(app, component_id, repair_id):
+    with app.app_context():
+        # A detail saved before reservations existed never took stock.
+        legacy = RepairDetail(repair_slip_id=repair_id, component_id=component_id, quantity=4, price_at_time=100)
+        db.session.add(legacy)
+        db.session.commit()
+
+        repair_dao.delete_repair_detail(legacy.id)
+        assert _stock(component_id) == STOCK
+
+
+def test_editing_unreserved_detail_reserves_new_quantity(app, component_id, repair_id):
+    with app.app_context():
+        legacy = RepairDetail(repair_slip_id=repair_id, component_id=component_id, quantity=4, price_at_time=100)
+        db.session.add(legacy)
+        db.session.commit()
+
+        repair_dao.update_repair_detail(legacy.id, quantity=6)
+        assert _stock(component_id) == STOCK - 6
+        repair_dao.delete_repair_detail(legacy.id)
+        assert _stock(component_id) == STOCK